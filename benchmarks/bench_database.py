@@ -0,0 +1,46 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+Benchmarks for the redirect path (`find_by_name` + `increment_visits`) of each database backend.
+
+Usage: python3 -m benchmarks.bench_database
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from golink import memorylog, model, sqlite
+
+NUMBER = 20000
+LINKS = 10000
+
+
+async def bench(name, database):
+    for n in range(LINKS):
+        await database.insert_or_replace(model.Golink('link{}'.format(n), 'https://example.com/{}/'.format(n)))
+
+    start = time.perf_counter()
+    for n in range(NUMBER):
+        link = 'link{}'.format(n % LINKS)
+        await database.find_by_name(link)
+        await database.increment_visits(link)
+    seconds = time.perf_counter() - start
+    print('{:<30} {:8.1f} us/redirect'.format(name, seconds / NUMBER * 1e6))
+    await database.close()
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    with tempfile.TemporaryDirectory() as tempdir:
+        loop.run_until_complete(bench('sqlite', sqlite.Database.connect(
+            os.path.join(tempdir, 'golinks.sqlite'), loop=loop)))
+        loop.run_until_complete(bench('memory-log', memorylog.Database.connect(
+            os.path.join(tempdir, 'golinks.log'), loop=loop)))
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+Benchmarks for serializing search results.
+
+Usage: python3 -m benchmarks.bench_json
+"""
+
+import json
+import timeit
+
+import attr
+
+from golink import model, serialization
+
+NUMBER = 1000
+RESULTS = 1000
+
+
+def bench(name, stmt):
+    seconds = min(timeit.repeat(stmt, number=NUMBER, repeat=5))
+    print('{:<30} {:8.1f} us/op'.format(name, seconds / NUMBER * 1e6))
+
+
+def main():
+    golinks = [model.Golink('link{}'.format(n), 'https://example.com/{}/'.format(n), 'owner', n)
+               for n in range(RESULTS)]
+
+    print('Serialize {} search results'.format(RESULTS))
+    bench('attr.asdict + json', lambda: json.dumps({'golinks': [attr.asdict(g) for g in golinks]}))
+    for encoder in sorted(serialization.ENCODERS):
+        if encoder == 'orjson' and serialization.orjson is None:
+            print('{:<30} (not installed)'.format(encoder))
+            continue
+        serializer = serialization.create_serializer(encoder)
+        bench(encoder, lambda: serializer.golinks(golinks))
+        serializer = serialization.create_serializer(encoder, fragments=True)
+        bench(encoder + ' (fragments)', lambda: serializer.golinks(golinks))
+
+
+if __name__ == '__main__':
+    main()
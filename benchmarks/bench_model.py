@@ -0,0 +1,34 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+Benchmarks for building redirect URLs.
+
+Usage: python3 -m benchmarks.bench_model
+"""
+
+import timeit
+
+from golink import model
+
+NUMBER = 100000
+
+
+def bench(name, stmt):
+    seconds = min(timeit.repeat(stmt, number=NUMBER, repeat=5))
+    print('{:<30} {:8.3f} us/op'.format(name, seconds / NUMBER * 1e6))
+    return seconds
+
+
+def main():
+    suffix_link = model.Golink('bug', 'https://tracker/issues?id=')
+    template_link = model.Golink('bug', 'https://tracker/issues?id={1}&view=full')
+
+    print('Redirect URL expansion ({} iterations)'.format(NUMBER))
+    with_suffix = bench('with_suffix (urlsplit)', lambda: suffix_link.with_suffix('1234'))
+    expand = bench('expand (template)', lambda: template_link.expand('1234'))
+    bench('expand (no suffix)', lambda: suffix_link.expand(''))
+    print('Template expansion is {:.1f}x the speed of with_suffix'.format(with_suffix / expand))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+Benchmarks for concurrent writes (`insert_or_replace` + `increment_visits`) by number of SQLite shards.
+
+Usage: python3 -m benchmarks.bench_sharded
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from golink import model, shardedsqlite
+
+NUMBER = 5000
+CONCURRENCY = 64
+SHARDS = (1, 2, 4, 8)
+
+
+async def bench(shards, database):
+    async def writer(start):
+        for n in range(start, NUMBER, CONCURRENCY):
+            link = 'link{}'.format(n)
+            await database.insert_or_replace(model.Golink(link, 'https://example.com/{}/'.format(n)))
+            await database.increment_visits(link)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(n) for n in range(CONCURRENCY)))
+    seconds = time.perf_counter() - start
+    print('{:>2} shards {:10.0f} writes/s'.format(shards, 2 * NUMBER / seconds))
+    await database.close()
+
+
+def main():
+    print('{} CPUs'.format(os.cpu_count()))
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    with tempfile.TemporaryDirectory() as tempdir:
+        for shards in SHARDS:
+            path = os.path.join(tempdir, 'golinks{}.sqlite'.format(shards))
+            loop.run_until_complete(bench(shards, shardedsqlite.Database.connect(path, shards=shards, loop=loop)))
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
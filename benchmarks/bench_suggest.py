@@ -0,0 +1,61 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+Benchmarks for "did you mean" suggestions.
+
+Usage: python3 -m benchmarks.bench_suggest [NUMBER_OF_NAMES]
+"""
+
+import random
+import string
+import sys
+import time
+import timeit
+
+from golink import suggest
+
+NUMBER = 1000
+ALPHABET = string.ascii_lowercase + string.digits + '-'
+
+
+def random_name(rng):
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(3, 16)))
+
+
+def typo(rng, name):
+    i = rng.randrange(len(name) - 1)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(0)
+    names = [random_name(rng) for _ in range(count)]
+
+    start = time.perf_counter()
+    index = suggest.SuggestionIndex()
+    for name in names:
+        index.add(name, rng.randrange(1000))
+    print('Indexed {} names in {:.1f} s'.format(len(index), time.perf_counter() - start))
+
+    queries = [typo(rng, rng.choice(names)) for _ in range(NUMBER)]
+    misses = [random_name(rng) + 'zz' for _ in range(NUMBER)]
+    bench(index, 'suggest (typo)', queries)
+    bench(index, 'suggest (no match)', misses)
+
+    # Names that share a prefix (or suffix), e.g. `project-1`, `project-2`, ...
+    shared = ['project-{}'.format(n) for n in range(count // 2)] + ['{}-notes'.format(n) for n in range(count // 2)]
+    index = suggest.SuggestionIndex()
+    for name in shared:
+        index.add(name, rng.randrange(1000))
+    bench(index, 'suggest (shared prefix)', [typo(rng, rng.choice(shared)) for _ in range(NUMBER)])
+
+
+def bench(index, label, words):
+    it = iter(words)
+    seconds = min(timeit.repeat(lambda: index.suggest(next(it)), number=NUMBER, repeat=1))
+    print('{:<30} {:8.3f} us/op'.format(label, seconds / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+End-to-end benchmarks of redirects and JSON search over HTTP for each event loop and JSON encoder.
+
+The client runs in the same process and event loop as the server, so results are only useful for comparison.
+
+Usage: python3 -m benchmarks.bench_webapp
+"""
+
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+
+from golink import auth, model, serialization, sqlite, views, webapp
+
+REQUESTS = 2000
+CONCURRENCY = 20
+PORT = 18080
+
+
+async def run(database, json_serializer):
+    for n in range(1000):
+        await database.insert_or_replace(model.Golink('link{}'.format(n), 'https://example.com/{}/'.format(n)))
+
+    app = web.Application()
+    app['DATABASE'] = database
+    app['AUTH_TYPE'] = auth.NullAuth
+    app['JSON_SERIALIZER'] = json_serializer
+    app.router.add_routes(views.routes)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, 'localhost', PORT).start()
+
+    results = {}
+    try:
+        async with aiohttp.ClientSession() as session:
+            async def fetch(path, headers=None):
+                async with session.get('http://localhost:{}{}'.format(PORT, path), headers=headers,
+                                       allow_redirects=False) as resp:
+                    await resp.read()
+
+            for label, path, headers in (('redirect', '/link1/foo', None),
+                                         ('search', '/+search?q=link', {'Accept': 'application/json'})):
+                semaphore = asyncio.Semaphore(CONCURRENCY)
+
+                async def limited():
+                    async with semaphore:
+                        await fetch(path, headers)
+
+                start = time.perf_counter()
+                await asyncio.gather(*(limited() for _ in range(REQUESTS)))
+                results[label] = REQUESTS / (time.perf_counter() - start)
+    finally:
+        await runner.cleanup()
+
+    return results
+
+
+def main():
+    for loop_type in ('asyncio', 'uvloop'):
+        for encoder in sorted(serialization.ENCODERS):
+            loop = webapp.new_event_loop(loop_type)
+            asyncio.set_event_loop(loop)
+            database = sqlite.Database.connect(':memory:', loop=loop)
+            results = loop.run_until_complete(run(database, serialization.create_serializer(encoder)))
+            loop.close()
+            print('{:<8} {:<8} {}'.format(loop_type, encoder, '  '.join(
+                '{}: {:6.0f} req/s'.format(label, rate) for label, rate in results.items())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+Structured (JSON lines) access log.
+
+Records are queued on the event loop and written in batches by a background thread,
+so formatting and file I/O never block request handling.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Iterator
+
+from aiohttp import abc, web
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_ROTATE_INTERVAL = 24 * 60 * 60
+DEFAULT_BACKUP_COUNT = 7
+
+_STOP = object()
+
+
+class AccessLog:
+    """
+    Buffered JSON lines access log writer.
+
+    Records are placed in a bounded queue. If the queue is full the record is
+    dropped (and counted in `dropped`) rather than stalling the event loop.
+    """
+
+    def __init__(self, path, queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, max_bytes=DEFAULT_MAX_BYTES,
+                 rotate_interval=DEFAULT_ROTATE_INTERVAL, backup_count=DEFAULT_BACKUP_COUNT):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.dropped = 0
+        self._queue = queue.Queue(queue_size)
+        self._file = None
+        self._opened_at = None
+        self._thread = None
+
+    def start(self):
+        """Start the background writer thread."""
+        if self._thread is not None:
+            return
+
+        self._open()
+        self._thread = threading.Thread(target=self._run, name='golink-accesslog', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Flush all queued records and stop the writer thread."""
+        if self._thread is None:
+            return
+
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        self._file = None
+
+    def write(self, record: dict):
+        """Queue a record for writing. Never blocks."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._opened_at = time.time()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = None
+
+            while record is not None:
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    record = None
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception:
+                    logging.exception('Failed to write access log')
+
+    def _write_batch(self, batch):
+        if self._should_rotate():
+            self._rotate()
+
+        self._file.write(''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in batch))
+        self._file.flush()
+
+    def _should_rotate(self):
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+
+        if self.rotate_interval and time.time() - self._opened_at >= self.rotate_interval:
+            return self._file.tell() > 0
+
+        return False
+
+    def _rotate(self):
+        self._file.close()
+        for n in range(self.backup_count - 1, 0, -1):
+            src = '{}.{}'.format(self.path, n)
+            if os.path.exists(src):
+                os.replace(src, '{}.{}'.format(self.path, n + 1))
+        if self.backup_count > 0:
+            os.replace(self.path, '{}.1'.format(self.path))
+        else:
+            os.remove(self.path)
+        self._open()
+
+
+def read_records(path) -> Iterator[dict]:
+    """
+    Read access log records from `path` and any rotated backups, oldest first.
+
+    Intended as an input source for offline analysis.
+    """
+    backups = []
+    n = 1
+    while os.path.exists('{}.{}'.format(path, n)):
+        backups.append('{}.{}'.format(path, n))
+        n += 1
+
+    for filename in reversed(backups):
+        yield from _read_file(filename)
+
+    if os.path.exists(path):
+        yield from _read_file(path)
+
+
+def _read_file(filename):
+    with open(filename, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class AccessLogger(abc.AbstractAccessLogger):
+    """aiohttp access logger that forwards structured records to the application's `AccessLog`."""
+
+    def log(self, request: web.Request, response: web.StreamResponse, duration: float):
+        access_log = request.app.get('ACCESS_LOG')
+        if access_log is None:
+            return
+
+        access_log.write({
+            'time': time.time(),
+            'remote': request.remote,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status,
+            'duration': duration,
+            'name': request.get('name'),
+            'suffix': request.get('suffix') or None,
+            'hit': request.get('hit'),
+            'backend_latency': request.get('backend_latency'),
+            'target': request.get('target'),
+            'user_agent': request.headers.get('User-Agent'),
+        })
+
+
+def setup(app: web.Application, access_log: AccessLog):
+    """Attach `access_log` to `app`, starting and stopping it with the application."""
+    async def on_startup(app):
+        access_log.start()
+
+    async def on_cleanup(app):
+        access_log.close()
+
+    app['ACCESS_LOG'] = access_log
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
@@ -0,0 +1,259 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+Background checker for Golinks that point at dead URLs.
+
+Links are checked with a bounded pool of concurrent requests, rate limited per host.
+Each link is checked with `HEAD` (falling back to `GET` if the server does not support it)
+and re-checked conditionally using the `ETag`/`Last-Modified` of the previous check.
+Templates (e.g. `https://tracker/browse/{1}`) are only checked for whether their host is reachable.
+Results are written back to the database in batches and used to rank dead links last in search results.
+
+Usage: python3 -m golink.linkcheck --database golinks.sqlite
+"""
+
+import argparse
+import asyncio
+import collections
+import logging
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import aiohttp
+import attr
+
+from golink import persistence, shardedsqlite
+from golink.model import LinkStatus, compile_url
+
+DEFAULT_CONCURRENCY = 20
+DEFAULT_HOST_INTERVAL = 1.0
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_RECHECK_INTERVAL = 7 * 24 * 60 * 60
+DEFAULT_DEAD_RECHECK_INTERVAL = 24 * 60 * 60
+DEFAULT_BATCH_SIZE = 100
+# Maximum number of links read from the database but not yet checked
+MAX_PENDING = 10000
+
+# Statuses that indicate `HEAD` is not supported (or not allowed) rather than the link being dead
+HEAD_FALLBACK_STATUSES = {403, 404, 405, 501}
+# Statuses that indicate the link is dead
+DEAD_STATUSES = {404, 410}
+
+USER_AGENT = 'golink-linkcheck'
+
+
+class HostRateLimiter:
+    """Limits requests to each host to one every `interval` seconds."""
+
+    def __init__(self, interval=DEFAULT_HOST_INTERVAL):
+        self.interval = interval
+        self._next = {}
+
+    async def wait(self, host):
+        # Reserve the next free slot for the host, then wait for it
+        now = time.monotonic()
+        slot = max(now, self._next.get(host, now))
+        self._next[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class LinkChecker:
+    """Checks Golink URLs in `database` and records which are dead."""
+
+    def __init__(self, database: persistence.Database, session: aiohttp.ClientSession = None,
+                 concurrency=DEFAULT_CONCURRENCY, host_interval=DEFAULT_HOST_INTERVAL, timeout=DEFAULT_TIMEOUT,
+                 recheck_interval=DEFAULT_RECHECK_INTERVAL, dead_recheck_interval=DEFAULT_DEAD_RECHECK_INTERVAL,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.database = database
+        self.session = session
+        self.concurrency = concurrency
+        self.rate_limiter = HostRateLimiter(host_interval)
+        # Limits concurrent requests (but not links waiting on the rate limiter)
+        self._requests = asyncio.Semaphore(concurrency)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.recheck_interval = recheck_interval
+        self.dead_recheck_interval = dead_recheck_interval
+        self.batch_size = batch_size
+
+    def is_due(self, status: LinkStatus, now=None):
+        """Is `status` due to be re-checked?"""
+        if status.checked is None:
+            return True
+
+        now = time.time() if now is None else now
+        interval = self.dead_recheck_interval if status.dead else self.recheck_interval
+        return now - status.checked >= interval
+
+    async def run(self):
+        """
+        Check all links that are due to be checked.
+
+        :return: Number of links checked.
+        """
+        if self.session is not None:
+            return await self._run(self.session)
+
+        async with aiohttp.ClientSession(headers={'User-Agent': USER_AGENT}) as session:
+            return await self._run(session)
+
+    async def _run(self, session):
+        # Links are queued per host and each host's links are checked in turn, so links waiting
+        # on a host's rate limit don't hold up links to other hosts
+        queues = {}
+        tasks = set()
+        pending = asyncio.Semaphore(MAX_PENDING)
+        results = []
+        checked = 0
+
+        async def flush():
+            batch = results[:]
+            results.clear()
+            await self.database.update_link_statuses(batch)
+
+        async def check_host(host, queue):
+            nonlocal checked
+            while queue:
+                status = queue.popleft()
+                try:
+                    results.append(await self.check(status, session))
+                    checked += 1
+                    if len(results) >= self.batch_size:
+                        await flush()
+                except Exception:
+                    logging.exception('Failed to check %s', status.url)
+                finally:
+                    pending.release()
+            del queues[host]
+
+        try:
+            now = time.time()
+            for status in await self.database.find_link_statuses():
+                if not self.is_due(status, now):
+                    continue
+
+                # Don't queue up more than MAX_PENDING links
+                await pending.acquire()
+                host = urlsplit(_target_url(status)).hostname
+                if host not in queues:
+                    queues[host] = collections.deque()
+                    task = asyncio.ensure_future(check_host(host, queues[host]))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                queues[host].append(status)
+
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if results:
+            await flush()
+
+        return checked
+
+    async def check(self, status: LinkStatus, session: aiohttp.ClientSession = None) -> LinkStatus:
+        """Check a single link, returning its new status."""
+        session = session if session is not None else self.session
+        url = _target_url(status)
+        # Only the host of templates is checked, since the URL isn't known without a suffix
+        template = compile_url(status.url) is not None
+
+        # Only conditionally request links that were previously alive
+        headers = {}
+        if not status.dead:
+            if status.etag:
+                headers['If-None-Match'] = status.etag
+            if status.last_modified:
+                headers['If-Modified-Since'] = status.last_modified
+
+        await self.rate_limiter.wait(urlsplit(url).hostname)
+        try:
+            resp = await self._request(session, 'HEAD', url, headers)
+            if resp.status in HEAD_FALLBACK_STATUSES:
+                await self.rate_limiter.wait(urlsplit(url).hostname)
+                resp = await self._request(session, 'GET', url, headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logging.debug('Failed to fetch %s: %s', url, e)
+            return attr.evolve(status, dead=True, status=None, checked=time.time(), etag=None, last_modified=None)
+
+        if resp.status == 304:
+            return attr.evolve(status, dead=False, status=304, checked=time.time())
+
+        dead = not template and (resp.status in DEAD_STATUSES or resp.status >= 500)
+        return attr.evolve(status, dead=dead, status=resp.status, checked=time.time(),
+                           etag=resp.headers.get('ETag'), last_modified=resp.headers.get('Last-Modified'))
+
+    async def _request(self, session, method, url, headers):
+        async with self._requests:
+            async with session.request(method, url, headers=headers, timeout=self.timeout) as resp:
+                # Don't download the body of GET requests
+                return resp
+
+
+def _target_url(status: LinkStatus):
+    """URL to check for a Golink (the root of the host for templates)."""
+    if compile_url(status.url) is None:
+        return status.url
+
+    split = urlsplit(status.url)
+    return urlunsplit((split.scheme, split.netloc, '/', '', ''))
+
+
+async def run_periodically(checker: LinkChecker, interval):
+    """Run `checker` every `interval` seconds until cancelled."""
+    while True:
+        try:
+            checked = await checker.run()
+            logging.info('Checked %d links', checked)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception('Link check failed')
+        await asyncio.sleep(interval)
+
+
+def setup(app, checker: LinkChecker, interval):
+    """Run `checker` in the background of `app` every `interval` seconds."""
+    async def on_startup(app):
+        app['LINK_CHECKER'] = asyncio.ensure_future(run_periodically(checker, interval))
+
+    async def on_cleanup(app):
+        app['LINK_CHECKER'].cancel()
+        await asyncio.gather(app['LINK_CHECKER'], return_exceptions=True)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+
+
+def main():
+    from golink import webapp
+
+    parser = argparse.ArgumentParser(description='Check for Golinks that point at dead URLs.')
+    parser.add_argument('--database-type', default='sqlite')
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--database-shards', type=int, default=shardedsqlite.DEFAULT_SHARDS)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--host-interval', type=float, default=DEFAULT_HOST_INTERVAL,
+                        help='Minimum seconds between requests to the same host')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--recheck-interval', type=float, default=DEFAULT_RECHECK_INTERVAL)
+    parser.add_argument('--dead-recheck-interval', type=float, default=DEFAULT_DEAD_RECHECK_INTERVAL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    database = webapp.connect_to_database(args.database_type, args.database, loop=loop,
+                                          shards=args.database_shards)
+    checker = LinkChecker(database, concurrency=args.concurrency, host_interval=args.host_interval,
+                          timeout=args.timeout, recheck_interval=args.recheck_interval,
+                          dead_recheck_interval=args.dead_recheck_interval)
+    checked = loop.run_until_complete(checker.run())
+    logging.info('Checked %d links', checked)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,399 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+In-memory Golink database persisted to an append-only log.
+
+All Golinks are held in memory, so lookups never leave the event loop. Every change is appended
+to a JSON lines log file. Visits are accumulated in memory and logged in groups, and the log is
+fsynced periodically. On startup the latest snapshot is loaded and the log replayed on top of it.
+Once the log grows large it is compacted in the background by writing a new snapshot.
+
+Files (for `--database golinks.log`):
+
+- `golinks.log`: records since the last snapshot
+- `golinks.log.snapshot`: full state as of a log sequence number
+- `golinks.log.old`: log being compacted into a new snapshot (only present during compaction)
+"""
+
+import asyncio
+import bisect
+import heapq
+import itertools
+import json
+import logging
+import operator
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+import attr
+
+from golink import persistence
+from golink.model import Golink, LinkStatus, filter_by_url, url_hash, url_hash_or_none
+
+MEMORY = ':memory:'
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_COMPACT_MIN_RECORDS = 10000
+# Searches matching more than this fraction of Golinks check every Golink, rather than looking up each match
+SEARCH_INDEX_MAX_FRACTION = 1 / 16
+
+_GOLINK_FIELDS = tuple(field.name for field in attr.fields(Golink))
+_golink_values = operator.attrgetter(*_GOLINK_FIELDS)
+
+
+def _read_records(path):
+    """Yield `(record, offset)` for each record in `path`, where `offset` is the end of the record."""
+    try:
+        with open(path, 'rb') as f:
+            offset = 0
+            for line in f:
+                try:
+                    # A record without a newline may have been partially written
+                    if not line.endswith(b'\n'):
+                        raise ValueError('Incomplete record')
+                    record = json.loads(line)
+                except ValueError:
+                    # Partially written final record (e.g. after a crash)
+                    logging.warning('Ignoring corrupt record in %s', path)
+                    return
+                offset += len(line)
+                yield record, offset
+    except FileNotFoundError:
+        return
+
+
+def _fsync_and_close(fd):
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_snapshot(path, seq, golinks, statuses):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'seq': seq}) + '\n')
+        for values in golinks:
+            f.write(json.dumps({'op': 'put', 'golink': dict(zip(_GOLINK_FIELDS, values))}) + '\n')
+        for status in statuses:
+            f.write(json.dumps({'op': 'status', 'statuses': [attr.asdict(status)]}) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Database(persistence.Database):
+    @classmethod
+    def connect(cls, path, loop=None, **kwargs):
+        db = cls(None if path == MEMORY else path, loop, **kwargs)
+        db._load()
+        return db
+
+    def __init__(self, path=None, loop=None, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 compact_min_records=DEFAULT_COMPACT_MIN_RECORDS):
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self.path = path
+        self.flush_interval = flush_interval
+        self.compact_min_records = compact_min_records
+        self._loop = loop
+        self._executor = ThreadPoolExecutor(1)
+        self._golinks = {}
+        self._statuses = {}
+        self._by_owner = {}  # owner -> sorted list of names
+        self._by_url_hash = {}  # url_hash -> set of names
+        self._names = []  # sorted list of names
+        self._urls = []  # sorted list of (url, name)
+        self._name_text = None  # names joined by newlines (and their offsets), rebuilt on search after changes
+        self._visit_deltas = {}
+        self._seq = 0
+        self._log_records = 0
+        self._log = None
+        self._dirty = False
+        self._flusher = None
+        self._compaction = None
+
+    @property
+    def _snapshot_path(self):
+        return self.path + '.snapshot'
+
+    @property
+    def _old_log_path(self):
+        return self.path + '.old'
+
+    def _load(self):
+        if self.path is None:
+            return
+
+        snapshot_seq = 0
+        for record, _ in _read_records(self._snapshot_path):
+            if 'op' not in record:
+                snapshot_seq = self._seq = record['seq']
+            else:
+                self._apply(record)
+
+        for path in (self._old_log_path, self.path):
+            end = 0
+            for record, end in _read_records(path):
+                # Skip records already included in the snapshot
+                if record['seq'] > snapshot_seq:
+                    self._apply(record)
+                    self._seq = record['seq']
+                    self._log_records += 1
+            if os.path.exists(path) and os.path.getsize(path) > end:
+                # Discard anything after the last good record, so new records aren't appended after it
+                logging.warning('Truncating %s to its last complete record', path)
+                os.truncate(path, end)
+
+        if os.path.exists(self._old_log_path):
+            # Finish a compaction that was interrupted
+            _write_snapshot(self._snapshot_path, self._seq, *self._dump())
+            os.remove(self._old_log_path)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._log_records = 0
+
+        self._log = open(self.path, 'a', encoding='utf-8')
+
+    def _dump(self):
+        """
+        Copy of the current state, for writing a snapshot.
+
+        Golinks are mutable (visits), so their values are copied. Statuses are only ever replaced.
+        Converting them to JSON is left to `_write_snapshot`, outside of the event loop.
+        """
+        return [_golink_values(g) for g in self._golinks.values()], list(self._statuses.values())
+
+    def _apply(self, record):
+        op = record['op']
+        if op == 'put':
+            self._put(Golink(**record['golink']))
+        elif op == 'delete':
+            self._delete(record['name'])
+        elif op == 'visits':
+            for name, delta in record['visits'].items():
+                if name in self._golinks:
+                    self._golinks[name].visits += delta
+        elif op == 'status':
+            for status in record['statuses']:
+                self._update_status(LinkStatus(**status))
+        else:
+            raise ValueError(f'Unknown log record: {op}')
+
+    def _put(self, golink: Golink):
+        self._delete(golink.name)
+        self._golinks[golink.name] = golink
+        bisect.insort(self._names, golink.name)
+        bisect.insort(self._urls, (golink.url, golink.name))
+        self._name_text = None
+        bisect.insort(self._by_owner.setdefault(golink.owner, []), golink.name)
+        hashed = url_hash_or_none(golink.name, golink.url)
+        if hashed is not None:
+            self._by_url_hash.setdefault(hashed, set()).add(golink.name)
+
+    def _delete(self, name):
+        golink = self._golinks.pop(name, None)
+        if golink is None:
+            return
+
+        self._statuses.pop(name, None)
+        del self._names[bisect.bisect_left(self._names, name)]
+        del self._urls[bisect.bisect_left(self._urls, (golink.url, name))]
+        self._name_text = None
+        names = self._by_owner[golink.owner]
+        del names[bisect.bisect_left(names, name)]
+        if not names:
+            del self._by_owner[golink.owner]
+        hashed = url_hash_or_none(name, golink.url)
+        if hashed is not None:
+            self._by_url_hash[hashed].discard(name)
+            if not self._by_url_hash[hashed]:
+                del self._by_url_hash[hashed]
+
+    def _update_status(self, status: LinkStatus):
+        golink = self._golinks.get(status.name)
+        if golink is not None and golink.url == status.url:
+            self._statuses[status.name] = status
+
+    def _append(self, record):
+        """Append a record to the log."""
+        if self._log is None:
+            return
+
+        self._seq += 1
+        self._log.write(json.dumps(dict(record, seq=self._seq)) + '\n')
+        self._log.flush()
+        self._log_records += 1
+        self._dirty = True
+        self._start_flusher()
+
+        if self._log_records >= max(self.compact_min_records, 2 * len(self._golinks)):
+            self._start_compaction()
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._flusher = self._loop.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Log any pending visits and fsync the log."""
+        self._flush_visits()
+        if self._dirty and self._log is not None:
+            self._dirty = False
+            # Duplicate the descriptor, since the log may be switched (and closed) by a compaction
+            fd = os.dup(self._log.fileno())
+            await self._loop.run_in_executor(self._executor, _fsync_and_close, fd)
+
+    def _flush_visits(self):
+        if self._visit_deltas:
+            deltas, self._visit_deltas = self._visit_deltas, {}
+            self._append({'op': 'visits', 'visits': deltas})
+
+    def _start_compaction(self):
+        if self._compaction is None or self._compaction.done():
+            self._compaction = self._loop.create_task(self.compact())
+
+    async def compact(self):
+        """Write a snapshot of the current state and discard the log records it includes."""
+        if self._log is None:
+            return
+
+        # Copy state and switch to a new log without yielding to the event loop,
+        # so the snapshot includes exactly the records in the old log
+        self._flush_visits()
+        seq = self._seq
+        golinks, statuses = self._dump()
+        self._log.close()
+        os.replace(self.path, self._old_log_path)
+        self._log = open(self.path, 'a', encoding='utf-8')
+        self._log_records = 0
+
+        # Then write the snapshot in the background
+        await self._loop.run_in_executor(self._executor, _write_snapshot, self._snapshot_path, seq, golinks, statuses)
+        os.remove(self._old_log_path)
+        logging.info('Compacted %s (%d Golinks)', self.path, len(golinks))
+
+    async def close(self):
+        if self._compaction is not None:
+            await self._compaction
+        await self.flush()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self._executor.shutdown()
+
+    def _copy(self, golink: Golink) -> Golink:
+        # Callers must not be able to modify the stored Golinks
+        return attr.evolve(golink)
+
+    async def find_all(self) -> Iterator[Golink]:
+        return [self._copy(g) for g in self._golinks.values()]
+
+    async def find_by_owner(self, owner) -> Iterator[Golink]:
+        return [self._copy(self._golinks[name]) for name in self._by_owner.get(owner, ())]
+
+    async def find_by_name(self, name) -> Golink:
+        return self._copy(self._golinks[name])
+
+    async def find_by_url(self, url) -> Iterator[Golink]:
+        golinks = [self._golinks[name] for name in self._by_url_hash.get(url_hash(url), ())]
+        return [self._copy(g) for g in filter_by_url(sorted(golinks, key=lambda g: -g.visits), url)]
+
+    def _names_containing(self, query, max_matches):
+        """Names containing `query`, or `None` if there are more than `max_matches`."""
+        if self._name_text is None:
+            starts = list(itertools.accumulate((len(name) + 1 for name in self._names), initial=0))
+            self._name_text = '\n'.join(self._names), starts
+
+        text, starts = self._name_text
+        if '\n' in query:
+            return []
+        if text.count(query) > max_matches:
+            return None
+
+        # Search all names at once, then look up which names matched
+        names = []
+        i = text.find(query)
+        while i >= 0:
+            index = bisect.bisect_right(starts, i) - 1
+            names.append(self._names[index])
+            i = text.find(query, starts[index + 1])
+        return names
+
+    def _urls_starting_with(self, query, max_matches):
+        """Names of Golinks whose URL starts with `query`, or `None` if there are more than `max_matches`."""
+        start = bisect.bisect_left(self._urls, (query,))
+        end = start + max_matches
+        if end < len(self._urls) and self._urls[end][0].startswith(query):
+            return None
+
+        names = []
+        for url, name in self._urls[start:end]:
+            if not url.startswith(query):
+                break
+            names.append(name)
+        return names
+
+    async def search(self, query, limit=1000) -> Iterator[Golink]:
+        name_query = query.lower()
+        # Look up matches in the sorted names and URLs, unless there are many of them
+        max_matches = int(len(self._golinks) * SEARCH_INDEX_MAX_FRACTION)
+        names = self._names_containing(name_query, max_matches)
+        url_names = self._urls_starting_with(query, max_matches) if names is not None else None
+        if url_names is None:
+            matches = (g for g in self._golinks.values() if name_query in g.name or g.url.startswith(query))
+        else:
+            matches = (self._golinks[name] for name in dict.fromkeys(names + url_names))
+        return [self._copy(g) for g in heapq.nsmallest(limit, matches, key=self._search_key)]
+
+    def _search_key(self, golink):
+        status = self._statuses.get(golink.name)
+        return status is not None and status.dead, -golink.visits
+
+    async def find_link_statuses(self) -> Iterator[LinkStatus]:
+        return [self._statuses.get(name) or LinkStatus(name, golink.url) for name, golink in self._golinks.items()]
+
+    async def update_link_statuses(self, statuses: Iterable[LinkStatus]):
+        statuses = [s for s in statuses if s.name in self._golinks and self._golinks[s.name].url == s.url]
+        for status in statuses:
+            self._update_status(status)
+        if statuses:
+            self._append({'op': 'status', 'statuses': [attr.asdict(s) for s in statuses]})
+
+    async def insert_or_replace(self, golink: Golink):
+        if not isinstance(golink, Golink):
+            raise TypeError('Golink required')
+
+        # Log visits of the replaced Golink first so they aren't applied to its replacement
+        if golink.name in self._visit_deltas:
+            self._flush_visits()
+        golink = self._copy(golink)
+        self._put(golink)
+        self._append({'op': 'put', 'golink': attr.asdict(golink)})
+
+    async def increment_visits(self, name):
+        golink = self._golinks.get(name)
+        if golink is None:
+            return
+
+        golink.visits += 1
+        if self._log is not None:
+            self._visit_deltas[name] = self._visit_deltas.get(name, 0) + 1
+            self._start_flusher()
+
+    async def delete(self, name):
+        if name not in self._golinks:
+            return
+
+        if name in self._visit_deltas:
+            self._flush_visits()
+        self._delete(name)
+        self._append({'op': 'delete', 'name': name})
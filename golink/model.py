@@ -1,15 +1,22 @@
 # Copyright 2018 David Coles <coles.david@gmail.com>
 # This project is licensed under the terms of the MIT license. See LICENSE.txt
 
+import functools
+import hashlib
+import logging
 import re
-from urllib.parse import urlsplit, urlunsplit
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, quote, urlencode
 
 import attr
 
 NAME_RE = re.compile(r'[0-9a-zA-Z._-]+')
 VALID_SCHEMES = {'http', 'https'}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
 MAX_NAME_LENGTH = 120
 MAX_URL_LENGTH = 2000
+PLACEHOLDER_RE = re.compile(r'\{([1-9][0-9]*|\*)\}')
+ALL_SUFFIX = '*'
+MAX_COMPILED_TEMPLATES = 1 << 17
 
 
 def validate_name(name):
@@ -24,8 +31,8 @@ def validate_name(name):
         raise ValueError('Name must match {}'.format(NAME_RE.pattern))
 
 
-def validate_url(url):
-    """Validate a Golink URL."""
+def _validate_url_format(url):
+    """Validate the format of a (possibly existing) Golink URL."""
     if not url:
         raise ValueError('URL is required')
 
@@ -39,17 +46,171 @@ def validate_url(url):
         raise ValueError('URL must contain a hostname')
 
 
+def validate_url(url):
+    """
+    Validate a new or edited Golink URL.
+
+    This is stricter than the validation of existing Golinks, which may have been created before
+    these checks were added. Braces may only be used in placeholders.
+    """
+    _validate_url_format(url)
+
+    split = urlsplit(url)
+    try:
+        split.port
+    except ValueError:
+        raise ValueError('URL port must be a number from 0 to 65535')
+
+    # Placeholders (e.g. `{1}` or `{*}`) may only be used after the hostname
+    if '{' in split.netloc or '}' in split.netloc:
+        raise ValueError('URL hostname can not contain placeholders')
+    if '{' in PLACEHOLDER_RE.sub('', url) or '}' in PLACEHOLDER_RE.sub('', url):
+        raise ValueError('URL placeholders must be one of {1}, {2}, ... or {*} (use %7B and %7D for literal braces)')
+
+
+def compile_url(url):
+    """
+    Compile a URL template into an expansion plan.
+
+    The plan is a tuple of `(literal, index)` pairs where `index` is the 1-based suffix segment
+    (or `ALL_SUFFIX`) to insert after `literal`, or `None` for the trailing literal.
+    Returns `None` if the URL contains no placeholders.
+    """
+    # Most URLs aren't templates, so don't cache (or search) them
+    if '{' not in url:
+        return None
+
+    return _compile_template(url)
+
+
+# Plans are cached by URL rather than stored on each Golink, since most backends (e.g. SQLite and MongoDB)
+# return a new Golink for every lookup
+@functools.lru_cache(maxsize=MAX_COMPILED_TEMPLATES)
+def _compile_template(url):
+    plan = []
+    pos = 0
+    for m in PLACEHOLDER_RE.finditer(url):
+        index = m.group(1)
+        plan.append((url[pos:m.start()], ALL_SUFFIX if index == ALL_SUFFIX else int(index)))
+        pos = m.end()
+
+    if not plan:
+        return None
+
+    plan.append((url[pos:], None))
+    return tuple(plan)
+
+
+def expand_url(plan, suffix=''):
+    """
+    Expand a plan from `compile_url` using the `/`-separated segments of `suffix`.
+
+    Segments are percent-encoded, so they can't add to the query or fragment of the URL.
+    """
+    segments = suffix.split('/')
+    parts = []
+    for literal, index in plan:
+        parts.append(literal)
+        if index is None:
+            pass
+        elif index == ALL_SUFFIX:
+            parts.append(quote(suffix, safe='/'))
+        elif index <= len(segments):
+            parts.append(quote(segments[index - 1], safe=''))
+    return ''.join(parts)
+
+
+def normalize_url(url):
+    """
+    Normalize a URL for comparing link destinations.
+
+    Scheme and hostname are lowercased, default ports and fragments are dropped,
+    trailing slashes are removed from the path and query parameters are sorted.
+    """
+    split = urlsplit(url.strip())
+    scheme = split.scheme.lower()
+    netloc = (split.hostname or '').lower()
+    if ':' in netloc:
+        netloc = '[{}]'.format(netloc)  # IPv6 address
+    if split.port and split.port != DEFAULT_PORTS.get(scheme):
+        netloc = '{}:{}'.format(netloc, split.port)
+    if split.username or split.password:
+        userinfo = split.username or ''
+        if split.password:
+            userinfo += ':' + split.password
+        netloc = '{}@{}'.format(userinfo, netloc)
+    path = encode_braces(split.path.rstrip('/'))
+    query = encode_braces(urlencode(sorted(parse_qsl(split.query, keep_blank_values=True))))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def encode_braces(url):
+    """Percent-encode literal braces, so they aren't treated as placeholders."""
+    return url.replace('{', '%7B').replace('}', '%7D')
+
+
+def url_hash(url):
+    """Hash of the normalized form of `url`, used to index Golinks by destination."""
+    return hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()
+
+
+def url_hash_or_none(name, url):
+    """
+    `url_hash` of the URL of the Golink `name`, or `None` (with a warning) if it can't be normalized.
+
+    Golinks created before URLs were validated may have invalid URLs (e.g. a non-numeric port).
+    Such Golinks are stored without a hash, so they can't be found by URL.
+    """
+    try:
+        return url_hash(url)
+    except ValueError as e:
+        logging.warning('Not indexing URL of %s: %s', name, e)
+        return None
+
+
+def filter_by_url(golinks, url):
+    """Golinks from `golinks` (found by the `url_hash` of `url`) with the same destination as `url`."""
+    # Filters out any (unlikely) hash collisions
+    normalized = normalize_url(url)
+    return (golink for golink in golinks if normalize_url(golink.url) == normalized)
+
+
 @attr.s
 class Golink:
     """A Golink."""
     name = attr.ib(validator=lambda _, __, v: validate_name(v), converter=str.lower)
-    url = attr.ib(validator=lambda _, __, v: validate_url(v))
+    url = attr.ib(validator=lambda _, __, v: _validate_url_format(v))
     owner = attr.ib(default=None)
     visits = attr.ib(type=int, default=0)
 
+    @property
+    def is_template(self):
+        """Does the URL contain placeholders?"""
+        return compile_url(self.url) is not None
+
+    def expand(self, suffix=''):
+        """Get the redirect URL for `suffix`, either by filling in placeholders or appending it."""
+        plan = compile_url(self.url)
+        if plan is not None:
+            return expand_url(plan, suffix)
+
+        return self.with_suffix(suffix) if suffix else self.url
+
     def with_suffix(self, suffix=''):
         base_url = urlsplit(self.url, allow_fragments=False)
         # Append suffix to the base URL path (or anything following it)
         path = urlunsplit(('', '', base_url.path, base_url.query, '')) + suffix
         # Join everything back together again, ensuring scheme and netloc are unmodified
         return urlunsplit((base_url.scheme, base_url.netloc, path, '', ''))
+
+
+@attr.s
+class LinkStatus:
+    """Result of checking whether a Golink's URL is still reachable."""
+    name = attr.ib()
+    url = attr.ib()
+    dead = attr.ib(type=bool, default=False)
+    status = attr.ib(default=None)  # HTTP status code (or `None` if never checked or unreachable)
+    checked = attr.ib(default=None)  # Time of last check (seconds since the epoch)
+    etag = attr.ib(default=None)
+    last_modified = attr.ib(default=None)
@@ -1,59 +1,189 @@
 # Copyright 2018 David Coles <coles.david@gmail.com>
 # This project is licensed under the terms of the MIT license. See LICENSE.txt
 
+import logging
 import re
-from typing import Iterator
+from typing import Iterable, Iterator
 
 import attr
 import pymongo
 import pymongo.database
+from pymongo import IndexModel, UpdateOne
 
 from golink import persistence
-from golink.model import Golink
+from golink.model import Golink, LinkStatus, encode_braces, filter_by_url, url_hash, url_hash_or_none
 
 _GOLINK_PROJECTION = {field.name: True for field in attr.fields(Golink)}
 _GOLINK_PROJECTION['_id'] = False  # Don't include "_id" field
+_LINK_STATUS_FIELDS = {field.name: 'link_' + field.name for field in attr.fields(LinkStatus)
+                       if field.name not in ('name', 'url')}
+_LINK_STATUS_PROJECTION = {'_id': False, 'name': True, 'url': True, **{f: True for f in _LINK_STATUS_FIELDS.values()}}
+
+_OWNER_SORT = [('name', pymongo.ASCENDING)]
+# Dead links last (missing or false sort before true)
+_SEARCH_SORT = [('link_dead', pymongo.ASCENDING), ('visits', pymongo.DESCENDING)]
+
+INDEXES = [
+    IndexModel([('name', pymongo.ASCENDING)], unique=True),
+    IndexModel([('owner', pymongo.ASCENDING)] + _OWNER_SORT),
+    IndexModel([('url_hash', pymongo.ASCENDING)]),
+    # Search can't use index bounds for an unanchored regex, but can filter `name` while walking
+    # this index in sort order rather than scanning and sorting the whole collection
+    IndexModel(_SEARCH_SORT + [('name', pymongo.ASCENDING)]),
+]
+
+SCHEMA_VERSION = 2
+DEFAULT_DATABASE = 'golink'
+
+
+def _name_filter(name):
+    return {'name': name}
+
+
+def _owner_filter(owner):
+    return {'owner': owner}
+
+
+def _url_hash_filter(url):
+    return {'url_hash': url_hash(url)}
+
+
+def _search_filter(query):
+    return {'name': {'$regex': re.escape(query)}}  # Partial match
+
+
+def _backfill_url_hash(golinks: pymongo.collection.Collection):
+    """Backfill URL hashes of Golinks created before they were stored."""
+    for obj in golinks.find({'url_hash': {'$exists': False}}, projection={'name': True, 'url': True}):
+        hashed = url_hash_or_none(obj['name'], obj['url'])
+        if hashed is None:
+            continue
+        golinks.update_one({'_id': obj['_id']}, {'$set': {'url_hash': hashed}})
+
+
+def _encode_url_braces(golinks: pymongo.collection.Collection):
+    """Percent-encode braces in URLs created before templates were added, so they remain literal."""
+    for obj in golinks.find({'url': {'$regex': '[{}]'}}, projection={'name': True, 'url': True}):
+        url = encode_braces(obj['url'])
+        golinks.update_one({'_id': obj['_id']}, {'$set': {'url': url, 'url_hash': url_hash_or_none(obj['name'], url)}})
+
+
+# Migrations to upgrade the schema to each version (applied in order)
+MIGRATIONS = {
+    1: _backfill_url_hash,
+    2: _encode_url_braces,
+}
+
+
+def timeout_options(timeout):
+    """
+    MongoClient options that limit every operation to `timeout` seconds.
+
+    PyMongo blocks the event loop, so a stalled server can't be interrupted by an asyncio deadline.
+    """
+    ms = int(timeout * 1000)
+    return dict(socketTimeoutMS=ms, connectTimeoutMS=ms, serverSelectionTimeoutMS=ms)
 
 
 class Database(persistence.Database):
     @classmethod
-    def connect(cls, url):
+    def connect(cls, url, timeout=None, database_name=DEFAULT_DATABASE):
+        # Any database in the URL is only used for authentication (e.g. `/admin`), not for storing Golinks
         client = pymongo.MongoClient(url)
-        return cls(client)
+        # Upgrades (e.g. building indexes) may take longer than `timeout`
+        cls(client, database_name)._upgrade_schema()
+        if timeout:
+            client.close()
+            client = pymongo.MongoClient(url, **timeout_options(timeout))
+        return cls(client, database_name)
 
     @property
     def _db(self) -> pymongo.database.Database:
-        return self.client.golink
+        return self.client[self.database_name]
 
     @property
     def _golinks(self) -> pymongo.collection.Collection:
         return self._db['golinks']
 
-    def __init__(self, client: pymongo.MongoClient):
+    @property
+    def _meta(self) -> pymongo.collection.Collection:
+        return self._db['meta']
+
+    def __init__(self, client: pymongo.MongoClient, database_name=DEFAULT_DATABASE):
         self.client = client
+        self.database_name = database_name
+
+    @property
+    def schema_version(self):
+        obj = self._meta.find_one({'_id': 'schema'})
+        return obj['version'] if obj else 0
+
+    def _upgrade_schema(self):
+        """Apply any outstanding migrations and create indexes."""
+        version = self.schema_version
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f'Database schema version {version} is newer than supported ({SCHEMA_VERSION})')
+
+        for v in range(version + 1, SCHEMA_VERSION + 1):
+            logging.info('Upgrading database schema to version %d', v)
+            MIGRATIONS[v](self._golinks)
+            self._meta.update_one({'_id': 'schema'}, {'$set': {'version': v}}, upsert=True)
+
+        self._create_indexes()
+
+    def _create_indexes(self):
+        duplicates = [obj['_id'] for obj in self._golinks.aggregate([
+            {'$group': {'_id': '$name', 'count': {'$sum': 1}}},
+            {'$match': {'count': {'$gt': 1}}},
+        ])]
+        if duplicates:
+            raise RuntimeError('Golink names must be unique. Remove duplicates of: {}'.format(
+                ', '.join(sorted(duplicates))))
+
+        self._golinks.create_indexes(INDEXES)
+
+    async def find_all(self) -> Iterator[Golink]:
+        return self._find_golinks({})
 
     async def find_by_owner(self, owner) -> Iterator[Golink]:
-        return self._find_golinks({'owner': owner})
+        return self._find_golinks(_owner_filter(owner), sort=_OWNER_SORT)
 
-    def _find_golinks(self, filter, limit=0):
-        return (Golink(**obj) for obj in self._golinks.find(filter, projection=_GOLINK_PROJECTION, limit=limit))
+    def _find_golinks(self, filter, limit=0, sort=None):
+        return (Golink(**obj) for obj in self._golinks.find(
+            filter, projection=_GOLINK_PROJECTION, limit=limit, sort=sort))
 
     async def find_by_name(self, name) -> Golink:
-        obj = self._golinks.find_one({'name': name}, projection=_GOLINK_PROJECTION)
+        obj = self._golinks.find_one(_name_filter(name), projection=_GOLINK_PROJECTION)
         if not obj:
             raise KeyError(name)
 
         return Golink(**obj)
 
+    async def find_by_url(self, url) -> Iterator[Golink]:
+        return filter_by_url(self._find_golinks(_url_hash_filter(url)), url)
+
     async def search(self, query, limit=1000) -> Iterator[Golink]:
-        name_re = re.escape(query)  # Partial match
-        return self._find_golinks({'name': {'$regex': name_re}}, limit=limit)
+        return self._find_golinks(_search_filter(query), limit=limit, sort=_SEARCH_SORT)
+
+    async def find_link_statuses(self) -> Iterator[LinkStatus]:
+        return (LinkStatus(obj['name'], obj['url'], **{
+                    field: obj[key] for field, key in _LINK_STATUS_FIELDS.items() if obj.get(key) is not None})
+                for obj in self._golinks.find({}, projection=_LINK_STATUS_PROJECTION))
+
+    async def update_link_statuses(self, statuses: Iterable[LinkStatus]):
+        requests = [UpdateOne(dict(_name_filter(s.name), url=s.url),
+                              {'$set': {key: getattr(s, field) for field, key in _LINK_STATUS_FIELDS.items()}})
+                    for s in statuses]
+        if requests:
+            self._golinks.bulk_write(requests, ordered=False)
 
     async def insert_or_replace(self, golink: Golink):
-        self._golinks.replace_one({'name': golink.name}, attr.asdict(golink), upsert=True)
+        obj = attr.asdict(golink)
+        obj['url_hash'] = url_hash(golink.url)
+        self._golinks.replace_one(_name_filter(golink.name), obj, upsert=True)
 
     async def increment_visits(self, name):
-        self._golinks.update_one({'name': name}, {'$inc': {'visits': 1}})
+        self._golinks.update_one(_name_filter(name), {'$inc': {'visits': 1}})
 
     async def delete(self, name):
-        self._golinks.delete_one({'name': name})
+        self._golinks.delete_one(_name_filter(name))
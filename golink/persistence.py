@@ -1,12 +1,20 @@
 # Copyright 2018 David Coles <coles.david@gmail.com>
 # This project is licensed under the terms of the MIT license. See LICENSE.txt
 
-from typing import Iterator
+from typing import Iterable, Iterator, List
 
-from golink.model import Golink
+from golink.model import Golink, LinkStatus
+
+
+class DatabaseUnavailable(Exception):
+    """The database is (temporarily) unavailable."""
 
 
 class Database:
+    async def find_all(self) -> Iterator[Golink]:
+        """Find all Golinks."""
+        raise NotImplementedError()
+
     async def find_by_owner(self, owner) -> Iterator[Golink]:
         """Find all Golinks created by `owner`."""
         raise NotImplementedError()
@@ -15,10 +23,30 @@ class Database:
         """Find a single Golink by `name`. Raises KeyError if not found."""
         raise NotImplementedError()
 
+    async def find_by_url(self, url) -> Iterator[Golink]:
+        """Find all Golinks whose URL normalizes to the same as `url` (see `model.normalize_url`)."""
+        raise NotImplementedError()
+
     async def search(self, query, limit=1000) -> Iterator[Golink]:
         """Search for Golinks using a `query` string."""
         raise NotImplementedError()
 
+    async def suggest(self, name, limit=5) -> List[str]:
+        """Suggest names of existing Golinks similar to `name`. By default, makes no suggestions."""
+        return []
+
+    async def find_link_statuses(self) -> Iterator[LinkStatus]:
+        """Find the link check status of all Golinks."""
+        raise NotImplementedError()
+
+    async def update_link_statuses(self, statuses: Iterable[LinkStatus]):
+        """
+        Update the link check status of Golinks.
+
+        Statuses are ignored for Golinks that have since been deleted or whose URL has changed.
+        """
+        raise NotImplementedError()
+
     async def insert_or_replace(self, golink: Golink):
         """Insert or replace a Golink."""
         raise NotImplementedError()
@@ -31,4 +59,6 @@ class Database:
         """Delete an existing Golink by `name`."""
         raise NotImplementedError()
 
-
+    async def close(self):
+        """Close the database, completing any pending writes."""
+        pass
@@ -0,0 +1,214 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+Keep redirects working while the database backend is unhealthy.
+
+Database reads are given a deadline. Repeated failures open a circuit breaker, after which
+calls fail immediately until the backend has had time to recover. While the backend is unavailable,
+Golinks are served from a last-known-good snapshot and writes are rejected with `DatabaseUnavailable`.
+
+Note that deadlines can only interrupt backends that yield to the event loop (e.g. SQLite).
+Blocking backends (e.g. MongoDB) are instead given client-side timeouts (see `mongodb.timeout_options`).
+
+Creating, editing and deleting Golinks is not given a deadline: a timed out write would keep running
+in the backend and might still be committed after it was reported as failed. Such writes still wait
+for the backend (and its own timeouts), but are rejected immediately while the circuit breaker is open.
+Visit counts do have a deadline, since it doesn't matter if one is recorded late.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Iterable, Iterator, List
+
+import attr
+
+from golink import persistence
+from golink.model import Golink, LinkStatus
+from golink.persistence import DatabaseUnavailable
+
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_SNAPSHOT_TIMEOUT = 60.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_SNAPSHOT_INTERVAL = 5 * 60.0
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker that opens after `failure_threshold` consecutive failures.
+
+    Once `reset_timeout` seconds have passed, a single call is allowed through as a probe ("half-open").
+    A success closes the breaker, while a failure re-opens it. If the probe has neither succeeded nor
+    failed within another `reset_timeout` seconds, another probe is allowed.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._opened_at = None
+        self._probe_at = None
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self.clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Should a call be attempted?"""
+        state = self.state
+        if state == self.HALF_OPEN:
+            now = self.clock()
+            if self._probe_at is not None and now - self._probe_at < self.reset_timeout:
+                return False  # Wait for the probe already in progress
+            self._probe_at = now
+            return True
+        return state == self.CLOSED
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logging.info('Database recovered, closing circuit breaker')
+        self.failures = 0
+        self._opened_at = None
+        self._probe_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logging.warning('Database unhealthy, opening circuit breaker')
+            self._opened_at = self.clock()
+            self._probe_at = None
+
+
+async def _to_list(aw):
+    # Consume result iterators (e.g. database cursors) within the deadline
+    return list(await aw)
+
+
+class ResilientDatabase(persistence.Database):
+    """Database wrapper adding deadlines, a circuit breaker and a last-known-good snapshot to `database`."""
+
+    def __init__(self, database: persistence.Database, breaker: CircuitBreaker = None, timeout=DEFAULT_TIMEOUT,
+                 timeouts=None, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+        self.database = database
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.timeout = timeout
+        self.timeouts = dict({'find_all': DEFAULT_SNAPSHOT_TIMEOUT, 'find_link_statuses': DEFAULT_SNAPSHOT_TIMEOUT},
+                             **(timeouts or {}))
+        self.snapshot_interval = snapshot_interval
+        self._snapshot = {}
+        self._refresher = None
+
+    @property
+    def healthy(self):
+        return self.breaker.state == CircuitBreaker.CLOSED
+
+    async def _call(self, method, *args, iterator=False, deadline=True):
+        if not self.breaker.allow():
+            raise DatabaseUnavailable('Database is unavailable (circuit breaker open)')
+
+        aw = getattr(self.database, method)(*args)
+        if iterator:
+            aw = _to_list(aw)
+        try:
+            result = await (asyncio.wait_for(aw, self.timeouts.get(method, self.timeout)) if deadline else aw)
+        except (KeyError, ValueError, TypeError):
+            # Not found (or invalid arguments) is a successful response
+            self.breaker.record_success()
+            raise
+        except asyncio.TimeoutError as e:
+            self.breaker.record_failure()
+            raise DatabaseUnavailable(f'Database timed out ({method})') from e
+        except Exception as e:
+            self.breaker.record_failure()
+            raise DatabaseUnavailable(f'Database failed ({method}): {e}') from e
+
+        self.breaker.record_success()
+        return result
+
+    async def load(self):
+        """Take a snapshot of all Golinks and refresh it every `snapshot_interval` seconds."""
+        await self.refresh_snapshot()
+        if self._refresher is None and self.snapshot_interval:
+            self._refresher = asyncio.ensure_future(self._refresh_periodically())
+
+    async def refresh_snapshot(self):
+        golinks = await self._call('find_all', iterator=True)
+        self._snapshot = {g.name: attr.evolve(g) for g in golinks}
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.refresh_snapshot()
+            except DatabaseUnavailable as e:
+                logging.warning('Failed to refresh snapshot: %s', e)
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+        await self.database.close()
+
+    async def find_all(self) -> Iterator[Golink]:
+        return await self._call('find_all', iterator=True)
+
+    async def find_by_owner(self, owner) -> Iterator[Golink]:
+        return await self._call('find_by_owner', owner, iterator=True)
+
+    async def find_by_name(self, name) -> Golink:
+        try:
+            golink = await self._call('find_by_name', name)
+        except KeyError:
+            self._snapshot.pop(name, None)
+            raise
+        except DatabaseUnavailable:
+            # Serve the last known good Golink (if any)
+            if name not in self._snapshot:
+                raise KeyError(name)
+            return attr.evolve(self._snapshot[name])
+
+        self._snapshot[name] = attr.evolve(golink)
+        return golink
+
+    async def find_by_url(self, url) -> Iterator[Golink]:
+        return await self._call('find_by_url', url, iterator=True)
+
+    async def search(self, query, limit=1000) -> Iterator[Golink]:
+        return await self._call('search', query, limit, iterator=True)
+
+    async def suggest(self, name, limit=5) -> List[str]:
+        return await self._call('suggest', name, limit)
+
+    async def find_link_statuses(self) -> Iterator[LinkStatus]:
+        return await self._call('find_link_statuses', iterator=True)
+
+    async def update_link_statuses(self, statuses: Iterable[LinkStatus]):
+        await self._call('update_link_statuses', statuses, deadline=False)
+
+    async def insert_or_replace(self, golink: Golink):
+        await self._call('insert_or_replace', golink, deadline=False)
+        self._snapshot[golink.name] = attr.evolve(golink)
+
+    async def increment_visits(self, name):
+        try:
+            await self._call('increment_visits', name)
+        except DatabaseUnavailable as e:
+            # Don't fail redirects just because visits can't be counted
+            logging.debug('Failed to increment visits of %s: %s', name, e)
+
+    async def delete(self, name):
+        await self._call('delete', name, deadline=False)
+        self._snapshot.pop(name, None)
@@ -0,0 +1,94 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+JSON serialization of Golinks.
+
+`orjson` is used if installed (`pip install orjson`), otherwise the standard library `json` module.
+"""
+
+import functools
+import json
+import logging
+from typing import Iterable
+
+from aiohttp import web
+
+from golink.model import Golink
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FRAGMENT_CACHE_SIZE = 100000
+
+
+def golink_to_dict(golink: Golink) -> dict:
+    """Convert a Golink to a dict (equivalent to, but much cheaper than, `attr.asdict`)."""
+    return {'name': golink.name, 'url': golink.url, 'owner': golink.owner, 'visits': golink.visits}
+
+
+def _json_dumps(obj) -> str:
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def _orjson_dumps(obj) -> str:
+    return orjson.dumps(obj).decode('utf-8')
+
+
+class JsonSerializer:
+    """Serializes Golinks to JSON using `dumps`."""
+
+    def __init__(self, dumps=_json_dumps):
+        self.dumps = dumps
+
+    def golinks(self, golinks: Iterable[Golink]) -> str:
+        """Serialize `golinks` as a `{"golinks": [...]}` JSON document."""
+        return self.dumps({'golinks': [golink_to_dict(g) for g in golinks]})
+
+    def response(self, golinks: Iterable[Golink], headers=None) -> web.Response:
+        return web.Response(text=self.golinks(golinks), content_type='application/json', headers=headers)
+
+
+class FragmentJsonSerializer(JsonSerializer):
+    """
+    Serializes Golinks by joining precomputed JSON fragments.
+
+    Each Golink's `name`, `url` and `owner` are encoded once and cached, so serializing a
+    result only requires formatting the (frequently changing) visit count.
+    """
+
+    def __init__(self, dumps=_json_dumps, cache_size=FRAGMENT_CACHE_SIZE):
+        super().__init__(dumps)
+        self._fragment = functools.lru_cache(maxsize=cache_size)(self._encode_fragment)
+
+    def _encode_fragment(self, name, url, owner):
+        # Everything up to (but excluding) the value of the final "visits" field
+        obj = self.dumps({'name': name, 'url': url, 'owner': owner, 'visits': 0})
+        return obj[:obj.rindex(':') + 1]
+
+    def golink(self, golink: Golink) -> str:
+        return '{}{:d}}}'.format(self._fragment(golink.name, golink.url, golink.owner), golink.visits)
+
+    def golinks(self, golinks: Iterable[Golink]) -> str:
+        return '{{"golinks":[{}]}}'.format(','.join(self.golink(g) for g in golinks))
+
+
+ENCODERS = {
+    'json': _json_dumps,
+    'orjson': _orjson_dumps,
+}
+
+
+def create_serializer(encoder='json', fragments=False) -> JsonSerializer:
+    """
+    Create a serializer using the named `encoder`.
+
+    Falls back to the standard library `json` encoder if `encoder` is not installed.
+    """
+    if encoder == 'orjson' and orjson is None:
+        logging.warning('orjson is not installed, falling back to json')
+        encoder = 'json'
+
+    dumps = ENCODERS[encoder]
+    return FragmentJsonSerializer(dumps) if fragments else JsonSerializer(dumps)
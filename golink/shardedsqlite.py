@@ -0,0 +1,226 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+Golinks spread across several SQLite databases ("shards") by a hash of their name.
+
+Each shard has its own connection and writer thread, so writes to different shards don't
+contend for a single database lock. Lookups by name go to a single shard, while other queries
+are sent to all shards in parallel and their (sorted) results merged.
+
+Shard `i` of `n` for `--database golinks.sqlite` is stored in `golinks.sqlite.{i}`
+(or in memory for `--database :memory:`).
+Use `python3 -m golink.shardedsqlite` to change the number of shards of an existing database (offline).
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import sqlite3
+import urllib.request
+import zlib
+from typing import Iterable, Iterator
+
+from golink import persistence, sqlite
+from golink.model import Golink, LinkStatus, encode_braces, url_hash_or_none
+
+DEFAULT_SHARDS = 4
+MEMORY = ':memory:'
+
+CREATE_SHARD_TABLE_SQL = 'CREATE TABLE IF NOT EXISTS Shard (shard INT NOT NULL, shards INT NOT NULL)'
+FIND_SHARD_SQL = 'SELECT shard, shards FROM Shard'
+INSERT_SHARD_SQL = 'INSERT INTO Shard VALUES(?, ?)'
+
+
+def shard_for_name(name, shards):
+    """Index of the shard that stores the Golink `name`."""
+    return zlib.crc32(name.lower().encode('utf-8')) % shards
+
+
+def shard_path(path, shard):
+    return '{}.{}'.format(path, shard)
+
+
+def _create_shard_schema(con, shard, shards):
+    sqlite._create_schema(con)
+    with con:
+        con.execute(CREATE_SHARD_TABLE_SQL)
+        row = con.execute(FIND_SHARD_SQL).fetchone()
+        if row is None:
+            con.execute(INSERT_SHARD_SQL, (shard, shards))
+        elif row != (shard, shards):
+            raise RuntimeError('Database is shard {} of {}, not shard {} of {}'.format(*row, shard, shards))
+
+
+def _read_rows(con, batch_size):
+    """
+    Read all Golinks from an SQLite database `con` without modifying it.
+
+    Only the columns the database has are read, and rows of older schemas are upgraded as they are read
+    (see `sqlite._create_schema`).
+
+    :return: Names of the columns read and an iterator of batches of rows.
+    """
+    version, = con.execute('PRAGMA user_version').fetchone()
+    if version > sqlite.SCHEMA_VERSION:
+        raise RuntimeError(f'Database schema version {version} is newer than supported ({sqlite.SCHEMA_VERSION})')
+    existing = {row[1] for row in con.execute('PRAGMA table_info(Golinks)')}
+    if not existing:
+        raise RuntimeError('Database has no Golinks')
+    columns = [column for column in sqlite.ALL_COLUMNS.split(', ') if column in existing or column == 'url_hash']
+    url, hashed = columns.index('url'), columns.index('url_hash')
+
+    def batches():
+        select = ', '.join(column if column in existing else 'NULL' for column in columns)
+        cursor = con.execute(f'SELECT {select} FROM Golinks')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            if version < 1 or 'url_hash' not in existing:
+                rows = [list(row) for row in rows]
+                for row in rows:
+                    if version < 1:
+                        row[url] = encode_braces(row[url])
+                    row[hashed] = url_hash_or_none(row[0], row[url])
+            yield rows
+
+    return columns, batches()
+
+
+class Database(persistence.Database):
+    @classmethod
+    def connect(cls, path, shards=DEFAULT_SHARDS, loop=None):
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        databases = []
+        try:
+            for shard in range(shards):
+                # Each in-memory shard is a separate database
+                db = sqlite.Database.connect(MEMORY if path == MEMORY else shard_path(path, shard), loop=loop)
+                databases.append(db)
+                db._executor.submit(_create_shard_schema, db._con, shard, shards).result()
+        except Exception:
+            for db in databases:
+                db._executor.submit(db._con.close).result()
+                db._executor.shutdown()
+            raise
+        return cls(databases)
+
+    def __init__(self, shards):
+        self.shards = shards
+
+    def _shard(self, name) -> sqlite.Database:
+        return self.shards[shard_for_name(name, len(self.shards))]
+
+    async def _gather(self, method, *args):
+        return await asyncio.gather(*(getattr(shard, method)(*args) for shard in self.shards))
+
+    async def find_all(self) -> Iterator[Golink]:
+        return itertools.chain.from_iterable(await self._gather('find_all'))
+
+    async def find_by_owner(self, owner) -> Iterator[Golink]:
+        # Each shard's results are already ordered by name
+        return heapq.merge(*await self._gather('find_by_owner', owner), key=lambda g: g.name)
+
+    async def find_by_name(self, name) -> Golink:
+        return await self._shard(name).find_by_name(name)
+
+    async def find_by_url(self, url) -> Iterator[Golink]:
+        return heapq.merge(*await self._gather('find_by_url', url), key=lambda g: -g.visits)
+
+    async def search(self, query, limit=1000) -> Iterator[Golink]:
+        results = heapq.merge(*await self._gather('search_ranked', query, limit), key=lambda r: r[0])
+        return (golink for _, golink in itertools.islice(results, limit))
+
+    async def find_link_statuses(self) -> Iterator[LinkStatus]:
+        return itertools.chain.from_iterable(await self._gather('find_link_statuses'))
+
+    async def update_link_statuses(self, statuses: Iterable[LinkStatus]):
+        by_shard = {}
+        for status in statuses:
+            by_shard.setdefault(shard_for_name(status.name, len(self.shards)), []).append(status)
+        await asyncio.gather(*(self.shards[shard].update_link_statuses(s) for shard, s in by_shard.items()))
+
+    async def insert_or_replace(self, golink: Golink):
+        if not isinstance(golink, Golink):
+            raise TypeError('Golink required')
+
+        await self._shard(golink.name).insert_or_replace(golink)
+
+    async def increment_visits(self, name):
+        await self._shard(name).increment_visits(name)
+
+    async def delete(self, name):
+        await self._shard(name).delete(name)
+
+    async def close(self):
+        await self._gather('close')
+
+
+def reshard(source, source_shards, destination, destination_shards, batch_size=1000):
+    """
+    Copy all Golinks from `source` into `destination` split across `destination_shards`.
+
+    `source_shards` may be `None` if `source` is an unsharded SQLite database.
+    The source is opened read-only and left unchanged.
+    Must not be run while the source database is in use.
+    """
+    if source_shards is None:
+        source_paths = [source]
+    else:
+        source_paths = [shard_path(source, shard) for shard in range(source_shards)]
+    for path in source_paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+
+    destinations = []
+    for shard in range(destination_shards):
+        con = sqlite3.connect(shard_path(destination, shard))
+        _create_shard_schema(con, shard, destination_shards)
+        destinations.append(con)
+
+    count = 0
+    try:
+        for path in source_paths:
+            src = sqlite3.connect('file:{}?mode=ro'.format(urllib.request.pathname2url(os.path.abspath(path))),
+                                  uri=True)
+            try:
+                columns, batches = _read_rows(src, batch_size)
+                insert_sql = 'INSERT OR REPLACE INTO Golinks({}) VALUES({})'.format(
+                    ', '.join(columns), ', '.join('?' * len(columns)))
+                for rows in batches:
+                    by_shard = {}
+                    for row in rows:
+                        by_shard.setdefault(shard_for_name(row[0], destination_shards), []).append(row)
+                    for shard, shard_rows in by_shard.items():
+                        with destinations[shard]:
+                            destinations[shard].executemany(insert_sql, shard_rows)
+                    count += len(rows)
+            finally:
+                src.close()
+    finally:
+        for con in destinations:
+            con.close()
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy Golinks into a sharded SQLite database (offline).')
+    parser.add_argument('--source', required=True, help='Source database path')
+    parser.add_argument('--source-shards', type=int, help='Number of source shards (omit if not sharded)')
+    parser.add_argument('--destination', required=True, help='Destination database path')
+    parser.add_argument('--destination-shards', type=int, default=DEFAULT_SHARDS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    count = reshard(args.source, args.source_shards, args.destination, args.destination_shards)
+    logging.info('Copied %d Golinks into %d shards', count, args.destination_shards)
+
+
+if __name__ == '__main__':
+    main()
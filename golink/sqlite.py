@@ -9,28 +9,91 @@ from functools import partial
 
 import attr
 
-from golink.model import Golink
+from golink.model import Golink, LinkStatus, encode_braces, filter_by_url, url_hash, url_hash_or_none
 from golink import persistence
 
+# Version of the stored data (see `_create_schema`), stored as `PRAGMA user_version`
+SCHEMA_VERSION = 1
 CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS Golinks (
   name VARCHAR PRIMARY KEY COLLATE NOCASE,
   url VARCHAR NOT NULL,
   owner VARCHAR,
-  visits INT DEFAULT 0)
+  visits INT DEFAULT 0,
+  url_hash VARCHAR,
+  link_dead INT NOT NULL DEFAULT 0,
+  link_status INT,
+  link_checked REAL,
+  link_etag VARCHAR,
+  link_last_modified VARCHAR)
 '''
-FIND_BY_OWNER_SQL = 'SELECT * FROM Golinks WHERE owner=:owner ORDER BY name'
-FIND_BY_NAME_SQL = 'SELECT * FROM Golinks WHERE name=:name'
-SEARCH_SQL = '''SELECT *
+# Columns added since the original schema, added to existing tables on connect
+ADDED_COLUMNS = {
+    'url_hash': 'VARCHAR',
+    'link_dead': 'INT NOT NULL DEFAULT 0',
+    'link_status': 'INT',
+    'link_checked': 'REAL',
+    'link_etag': 'VARCHAR',
+    'link_last_modified': 'VARCHAR',
+}
+ADD_COLUMN_SQL = 'ALTER TABLE Golinks ADD COLUMN {} {}'
+CREATE_URL_HASH_INDEX_SQL = 'CREATE INDEX IF NOT EXISTS Golinks_url_hash ON Golinks(url_hash)'
+FIND_MISSING_URL_HASH_SQL = 'SELECT name, url FROM Golinks WHERE url_hash IS NULL'
+UPDATE_URL_HASH_SQL = 'UPDATE Golinks SET url_hash=:url_hash WHERE name=:name'
+GOLINK_COLUMNS = 'name, url, owner, visits'
+FIND_ALL_SQL = f'SELECT {GOLINK_COLUMNS} FROM Golinks'
+FIND_BY_OWNER_SQL = f'SELECT {GOLINK_COLUMNS} FROM Golinks WHERE owner=:owner ORDER BY name'
+FIND_BY_NAME_SQL = f'SELECT {GOLINK_COLUMNS} FROM Golinks WHERE name=:name'
+FIND_BY_URL_HASH_SQL = f'SELECT {GOLINK_COLUMNS} FROM Golinks WHERE url_hash=:url_hash ORDER BY visits DESC'
+SEARCH_SQL = f'''SELECT link_dead, {GOLINK_COLUMNS}
 FROM Golinks
 WHERE name GLOB :name_glob OR url GLOB :url_glob
-ORDER BY visits DESC
+ORDER BY link_dead, visits DESC
 LIMIT :limit
 '''
-INSERT_OR_REPLACE_SQL = 'INSERT OR REPLACE INTO Golinks VALUES(?, ?, ?, ?)'
+LINK_STATUS_COLUMNS = 'name, url, link_dead, link_status, link_checked, link_etag, link_last_modified'
+FIND_LINK_STATUSES_SQL = f'SELECT {LINK_STATUS_COLUMNS} FROM Golinks'
+UPDATE_LINK_STATUS_SQL = '''UPDATE Golinks
+SET link_dead=:dead, link_status=:status, link_checked=:checked, link_etag=:etag, link_last_modified=:last_modified
+WHERE name=:name AND url=:url
+'''
+ALL_COLUMNS = f'{GOLINK_COLUMNS}, ' + ', '.join(ADDED_COLUMNS)
+FIND_URLS_WITH_BRACES_SQL = "SELECT name, url FROM Golinks WHERE url GLOB '*[{}]*'"
+UPDATE_URL_SQL = 'UPDATE Golinks SET url=:url, url_hash=:url_hash WHERE name=:name'
+INSERT_OR_REPLACE_SQL = f'INSERT OR REPLACE INTO Golinks({GOLINK_COLUMNS}, url_hash) VALUES(?, ?, ?, ?, ?)'
 INCREMENT_SQL = 'UPDATE Golinks SET visits = visits + 1 WHERE name=:name'
 DELETE_SQL = 'DELETE FROM Golinks WHERE name=:name'
 
 
+def _create_schema(con):
+    """Create or upgrade the database schema."""
+    with con:
+        con.execute(CREATE_TABLE_SQL)
+        columns = {row[1] for row in con.execute('PRAGMA table_info(Golinks)')}
+        for column, definition in ADDED_COLUMNS.items():
+            if column not in columns:
+                con.execute(ADD_COLUMN_SQL.format(column, definition))
+        # Backfill URL hashes of Golinks created before the column existed
+        con.executemany(UPDATE_URL_HASH_SQL, [
+            dict(name=name, url_hash=url_hash_or_none(name, url)) for name, url in con.execute(FIND_MISSING_URL_HASH_SQL)])
+        con.execute(CREATE_URL_HASH_INDEX_SQL)
+
+        version, = con.execute('PRAGMA user_version').fetchone()
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f'Database schema version {version} is newer than supported ({SCHEMA_VERSION})')
+        if version < 1:
+            _encode_url_braces(con)
+        con.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+
+def _encode_url_braces(con):
+    """Percent-encode braces in URLs created before templates were added, so they remain literal."""
+    updates = []
+    for name, url in con.execute(FIND_URLS_WITH_BRACES_SQL).fetchall():
+        url = encode_braces(url)
+        updates.append(dict(name=name, url=url, url_hash=url_hash_or_none(name, url)))
+    con.executemany(UPDATE_URL_SQL, updates)
+
+
 def _loop_run_in_executor(func):
     def _run(self, *args, **kwargs):
         return self._loop.run_in_executor(
@@ -45,7 +108,7 @@ class Database(persistence.Database):
             loop = asyncio.get_event_loop()
         executor = ThreadPoolExecutor(1)
         con = executor.submit(sqlite3.connect, database).result()
-        executor.submit(con.execute, CREATE_TABLE_SQL).result()
+        executor.submit(_create_schema, con).result()
         return cls(con, executor, loop)
 
     def __init__(self, con, executor, loop=None):
@@ -55,6 +118,10 @@ class Database(persistence.Database):
         self._executor = executor
         self._loop = loop
 
+    @_loop_run_in_executor
+    def find_all(self) -> typing.Iterator[Golink]:
+        return (Golink(*row) for row in self._con.execute(FIND_ALL_SQL).fetchall())
+
     @_loop_run_in_executor
     def find_by_owner(self, owner) -> typing.Iterator[Golink]:
         return (Golink(*row) for row in self._con.execute(FIND_BY_OWNER_SQL, dict(owner=owner)).fetchall())
@@ -67,10 +134,34 @@ class Database(persistence.Database):
         return Golink(*value)
 
     @_loop_run_in_executor
-    def search(self, query, limit=1000):
+    def find_by_url(self, url):
+        rows = self._con.execute(FIND_BY_URL_HASH_SQL, dict(url_hash=url_hash(url))).fetchall()
+        return filter_by_url((Golink(*row) for row in rows), url)
+
+    def _search(self, query, limit):
         name_glob = '*{}*'.format(query)  # Partial match
         url_glob = '{}*'.format(query)  # Prefix match
-        return (Golink(*row) for row in self._con.execute(SEARCH_SQL, dict(name_glob=name_glob, url_glob=url_glob, limit=limit)).fetchall())
+        return self._con.execute(SEARCH_SQL, dict(name_glob=name_glob, url_glob=url_glob, limit=limit)).fetchall()
+
+    @_loop_run_in_executor
+    def search(self, query, limit=1000):
+        return (Golink(*row[1:]) for row in self._search(query, limit))
+
+    @_loop_run_in_executor
+    def search_ranked(self, query, limit=1000):
+        """Like `search`, but returns `(rank, golink)` pairs where `rank` orders the results (for merging)."""
+        return [((dead, -visits), Golink(name, url, owner, visits))
+                for dead, name, url, owner, visits in self._search(query, limit)]
+
+    @_loop_run_in_executor
+    def find_link_statuses(self) -> typing.Iterator[LinkStatus]:
+        rows = self._con.execute(FIND_LINK_STATUSES_SQL).fetchall()
+        return (LinkStatus(name, url, bool(dead), *rest) for name, url, dead, *rest in rows)
+
+    @_loop_run_in_executor
+    def update_link_statuses(self, statuses: typing.Iterable[LinkStatus]):
+        with self._con:
+            self._con.executemany(UPDATE_LINK_STATUS_SQL, [attr.asdict(s) for s in statuses])
 
     @_loop_run_in_executor
     def insert_or_replace(self, golink):
@@ -78,7 +169,7 @@ class Database(persistence.Database):
             raise TypeError('Golink required')
 
         with self._con:
-            self._con.execute(INSERT_OR_REPLACE_SQL, attr.astuple(golink))
+            self._con.execute(INSERT_OR_REPLACE_SQL, attr.astuple(golink) + (url_hash(golink.url),))
 
     @_loop_run_in_executor
     def increment_visits(self, name):
@@ -89,3 +180,7 @@ class Database(persistence.Database):
     def delete(self, name):
         with self._con:
             self._con.execute(DELETE_SQL, dict(name=name))
+
+    async def close(self):
+        await self._loop.run_in_executor(self._executor, self._con.close)
+        self._executor.shutdown()
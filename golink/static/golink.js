@@ -9,6 +9,37 @@ async function fetchSuggestions(current) {
     return await response.json();
 }
 
+async function fetchReverse(url) {
+    let headers = new Headers();
+    headers.append('Accept', 'application/json');
+    let request = new Request(`/+reverse?url=${encodeURIComponent(url)}`, {headers: headers});
+    let response = await fetch(request);
+    return await response.json();
+}
+
+/** Show a hint on the create form if other Golinks already point at the entered URL. **/
+async function updateDuplicateHint(input) {
+    let hint = document.getElementById('duplicate_hint');
+    let golinks = [];
+    if (input.value && input.checkValidity()) {
+        let results = await fetchReverse(input.value);
+        golinks = results.golinks;
+    }
+
+    let list = document.getElementById('duplicate_hint_golinks');
+    list.textContent = '';
+    for (let golink of golinks) {
+        let a = document.createElement('a');
+        a.href = `/+edit/${encodeURIComponent(golink.name)}`;
+        a.textContent = `go/${golink.name}`;
+        if (list.childNodes.length) {
+            list.appendChild(document.createTextNode(', '));
+        }
+        list.appendChild(a);
+    }
+    hint.hidden = golinks.length === 0;
+}
+
 function sleep(ms) { return new Promise(resolve => setTimeout(resolve, ms)); }
 
 /** Truncate string if greater than `maxLength`. **/
@@ -54,5 +85,11 @@ window.onload = evt => {
         let oldDatalist = document.getElementById('search_datalist');
         oldDatalist.parentNode.insertBefore(datalist, oldDatalist);
         oldDatalist.parentNode.removeChild(oldDatalist);
-    })
+    });
+
+    if (document.getElementById('duplicate_hint')) {
+        document.querySelector('input[name=url]').addEventListener('change', async (evt) => {
+            await updateDuplicateHint(evt.target);
+        });
+    }
 };
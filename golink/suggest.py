@@ -0,0 +1,196 @@
+# Copyright 2018 David Coles <coles.david@gmail.com>
+# This project is licensed under the terms of the MIT license. See LICENSE.txt
+"""
+"Did you mean" suggestions for unknown Golink names.
+
+Uses a SymSpell-style deletion dictionary: every name is indexed under each string that can be
+produced by deleting up to `max_distance` characters from a prefix of it, and likewise for a suffix
+of it. A lookup only needs to generate the same deletions of the query. Names close to the query
+share both a prefix and a suffix deletion with it, so only the names found by the more selective
+of the two are compared with the query. This keeps lookups fast even when many names share a
+prefix (e.g. `project-1`, `project-2`, ...) or a suffix.
+"""
+
+from typing import Iterable, Iterator, List
+
+from golink import persistence
+from golink.model import Golink, LinkStatus
+
+DEFAULT_MAX_DISTANCE = 1
+DEFAULT_PREFIX_LENGTH = 7
+DEFAULT_LIMIT = 5
+
+
+def osa_distance(a, b, max_distance):
+    """
+    Optimal string alignment distance between `a` and `b`.
+
+    Like Levenshtein distance, but also counts transposition of adjacent characters as a single edit.
+    Returns `max_distance + 1` once the distance is known to exceed `max_distance`.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if max_distance <= 1:
+        return _osa_distance_at_most_one(a, b, max_distance)
+
+    prev_prev = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev_prev[j - 2] + 1)
+        if min(cur) > max_distance:
+            return max_distance + 1
+        prev_prev, prev = prev, cur
+
+    return min(prev[-1], max_distance + 1)
+
+
+def _osa_distance_at_most_one(a, b, max_distance):
+    """`osa_distance` for `max_distance` <= 1, without building the full matrix."""
+    if a == b:
+        return 0
+    if max_distance < 1:
+        return 1
+
+    i = 0
+    while i < len(a) and i < len(b) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        # Substitution or transposition
+        if a[i + 1:] == b[i + 1:]:
+            return 1
+        if i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]:
+            return 1
+    elif a[i + 1:] == b[i:] or a[i:] == b[i + 1:]:
+        # Deletion or insertion
+        return 1
+    return 2
+
+
+class SuggestionIndex:
+    """In-memory index of Golink names for finding names within a small edit distance."""
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, prefix_length=DEFAULT_PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length  # Length of the prefix (and suffix) of names that is indexed
+        self._visits = {}
+        self._prefix_deletes = {}
+        self._suffix_deletes = {}
+
+    def __len__(self):
+        return len(self._visits)
+
+    def __contains__(self, name):
+        return name in self._visits
+
+    def _edits(self, word):
+        """All strings produced by deleting up to `max_distance` characters from `word`."""
+        edits = {word}
+        frontier = edits
+        for _ in range(self.max_distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            edits |= frontier
+        return edits
+
+    def _indexes(self, name):
+        """Pairs of (deletion dictionary, deletions of `name`) for the prefix and suffix of `name`."""
+        return ((self._prefix_deletes, self._edits(name[:self.prefix_length])),
+                (self._suffix_deletes, self._edits(name[-self.prefix_length:])))
+
+    def add(self, name, visits=0):
+        """Add (or update the visits of) `name`."""
+        if name not in self._visits:
+            for deletes, edits in self._indexes(name):
+                for edit in edits:
+                    deletes.setdefault(edit, set()).add(name)
+        self._visits[name] = visits
+
+    def remove(self, name):
+        """Remove `name` from the index (if present)."""
+        if self._visits.pop(name, None) is None:
+            return
+
+        for deletes, edits in self._indexes(name):
+            for edit in edits:
+                names = deletes.get(edit)
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del deletes[edit]
+
+    def increment_visits(self, name):
+        if name in self._visits:
+            self._visits[name] += 1
+
+    def suggest(self, name, limit=DEFAULT_LIMIT) -> List[str]:
+        """Suggest up to `limit` indexed names close to `name`, nearest and most visited first."""
+        # Matches are found by both the prefix and suffix, so only check those found by the fewest
+        buckets = min(([deletes[edit] for edit in edits if edit in deletes] for deletes, edits in self._indexes(name)),
+                      key=lambda b: sum(len(names) for names in b))
+        candidates = set().union(*buckets)
+        candidates.discard(name)
+
+        matches = []
+        for candidate in candidates:
+            distance = osa_distance(name, candidate, self.max_distance)
+            if distance <= self.max_distance:
+                matches.append((distance, -self._visits[candidate], candidate))
+
+        matches.sort()
+        return [candidate for _, _, candidate in matches[:limit]]
+
+
+class SuggestingDatabase(persistence.Database):
+    """Database wrapper that keeps a `SuggestionIndex` up to date with the Golinks in `database`."""
+
+    def __init__(self, database: persistence.Database, index: SuggestionIndex = None):
+        self.database = database
+        self.index = index if index is not None else SuggestionIndex()
+
+    async def load(self):
+        """Build the index from all existing Golinks."""
+        for golink in await self.database.find_all():
+            self.index.add(golink.name, golink.visits)
+
+    async def find_all(self) -> Iterator[Golink]:
+        return await self.database.find_all()
+
+    async def find_by_owner(self, owner) -> Iterator[Golink]:
+        return await self.database.find_by_owner(owner)
+
+    async def find_by_name(self, name) -> Golink:
+        return await self.database.find_by_name(name)
+
+    async def find_by_url(self, url) -> Iterator[Golink]:
+        return await self.database.find_by_url(url)
+
+    async def search(self, query, limit=1000) -> Iterator[Golink]:
+        return await self.database.search(query, limit)
+
+    async def suggest(self, name, limit=DEFAULT_LIMIT) -> List[str]:
+        return self.index.suggest(name, limit)
+
+    async def find_link_statuses(self) -> Iterator[LinkStatus]:
+        return await self.database.find_link_statuses()
+
+    async def update_link_statuses(self, statuses: Iterable[LinkStatus]):
+        await self.database.update_link_statuses(statuses)
+
+    async def insert_or_replace(self, golink: Golink):
+        await self.database.insert_or_replace(golink)
+        self.index.add(golink.name, golink.visits)
+
+    async def increment_visits(self, name):
+        await self.database.increment_visits(name)
+        self.index.increment_visits(name)
+
+    async def delete(self, name):
+        await self.database.delete(name)
+        self.index.remove(name)
+
+    async def close(self):
+        await self.database.close()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from aiohttp.test_utils import TestServer, unittest_run_loop
+
+from golink import accesslog
+from golink.test.test_views import BaseViewsTestCase
+
+
+class AccessLogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'access.log')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_write_and_read(self):
+        log = accesslog.AccessLog(self.path, flush_interval=0.01)
+        log.start()
+        for n in range(10):
+            log.write({'n': n})
+        log.close()
+
+        self.assertEqual([{'n': n} for n in range(10)], list(accesslog.read_records(self.path)))
+
+    def test_rotate_by_size(self):
+        log = accesslog.AccessLog(self.path, batch_size=1, flush_interval=0.01, max_bytes=1, backup_count=100)
+        log.start()
+        for n in range(5):
+            log.write({'n': n})
+        log.close()
+
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertEqual([{'n': n} for n in range(5)], list(accesslog.read_records(self.path)))
+
+    def test_rotate_backup_count(self):
+        log = accesslog.AccessLog(self.path, batch_size=1, flush_interval=0.01, max_bytes=1, backup_count=2)
+        log.start()
+        for n in range(5):
+            log.write({'n': n})
+        log.close()
+
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        self.assertEqual([{'n': n} for n in range(2, 5)], list(accesslog.read_records(self.path)))
+
+    def test_queue_full_drops(self):
+        log = accesslog.AccessLog(self.path, queue_size=2)
+        # Writer not started, so queue fills up
+        for n in range(5):
+            log.write({'n': n})
+
+        self.assertEqual(3, log.dropped)
+
+
+class AccessLogTestServer(TestServer):
+    async def start_server(self, **kwargs):
+        await super().start_server(access_log_class=accesslog.AccessLogger, **kwargs)
+
+
+class AccessLoggerViewsTestCase(BaseViewsTestCase):
+    async def get_application(self):
+        app = await super().get_application()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'access.log')
+        accesslog.setup(app, accesslog.AccessLog(self.path, flush_interval=0.01))
+        return app
+
+    async def get_server(self, app):
+        return AccessLogTestServer(app)
+
+    def tearDown(self):
+        super().tearDown()
+        self.tempdir.cleanup()
+
+    @unittest_run_loop
+    async def test_golink_hit_and_miss(self):
+        await self.add_golink_url()
+
+        await self.get_golink('/test/foo')
+        await self.get_golink('/missing')
+        await self.client.close()  # Ensure all requests have been logged
+        self.app['ACCESS_LOG'].close()
+
+        hit, miss = accesslog.read_records(self.path)
+        self.assertEqual('test', hit['name'])
+        self.assertEqual('foo', hit['suffix'])
+        self.assertTrue(hit['hit'])
+        self.assertEqual('http://example.com/test/foo', hit['target'])
+        self.assertEqual(302, hit['status'])
+        self.assertIsNotNone(hit['backend_latency'])
+
+        self.assertEqual('missing', miss['name'])
+        self.assertFalse(miss['hit'])
+        self.assertIsNone(miss['target'])
+        self.assertEqual(303, miss['status'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase, unittest_run_loop
+
+from golink import linkcheck, model, sqlite
+from golink.test.util import AsyncTestCase
+
+
+class StubServerTestCase(AioHTTPTestCase):
+    """Tests for LinkChecker against a local stub HTTP server."""
+
+    ETAG = '"v1"'
+
+    async def get_application(self):
+        self.requests = []
+        self.hosts = []
+
+        async def ok(request):
+            self.requests.append((request.method, request.path))
+            self.hosts.append(request.host.split(':')[0])
+            return web.Response(text='ok')
+
+        async def no_head(request):
+            self.requests.append((request.method, request.path))
+            if request.method == 'HEAD':
+                raise web.HTTPMethodNotAllowed('HEAD', ['GET'])
+            return web.Response(text='ok')
+
+        async def dead(request):
+            self.requests.append((request.method, request.path))
+            raise web.HTTPNotFound()
+
+        async def etag(request):
+            self.requests.append((request.method, request.path))
+            if request.headers.get('If-None-Match') == self.ETAG:
+                raise web.HTTPNotModified()
+            return web.Response(text='ok', headers={'ETag': self.ETAG})
+
+        app = web.Application()
+        app.router.add_route('*', '/ok', ok)
+        app.router.add_route('*', '/no-head', no_head)
+        app.router.add_route('*', '/dead', dead)
+        app.router.add_route('*', '/etag', etag)
+        return app
+
+    def url(self, path):
+        return str(self.server.make_url(path))
+
+    async def create_checker(self, golinks, **kwargs):
+        self.database = sqlite.Database.connect(':memory:', loop=asyncio.get_running_loop())
+        for name, path in golinks:
+            await self.database.insert_or_replace(model.Golink(name, self.url(path)))
+        return linkcheck.LinkChecker(self.database, host_interval=0, **kwargs)
+
+    async def statuses(self):
+        return {s.name: s for s in await self.database.find_link_statuses()}
+
+    @unittest_run_loop
+    async def test_check(self):
+        checker = await self.create_checker([('ok', '/ok'), ('nohead', '/no-head'), ('dead', '/dead')])
+
+        self.assertEqual(3, await checker.run())
+        statuses = await self.statuses()
+        self.assertFalse(statuses['ok'].dead)
+        self.assertEqual(200, statuses['ok'].status)
+        self.assertFalse(statuses['nohead'].dead)
+        self.assertEqual(200, statuses['nohead'].status)
+        self.assertTrue(statuses['dead'].dead)
+        self.assertEqual(404, statuses['dead'].status)
+        self.assertIsNotNone(statuses['dead'].checked)
+
+        self.assertIn(('HEAD', '/ok'), self.requests)
+        self.assertNotIn(('GET', '/ok'), self.requests)
+        self.assertIn(('GET', '/no-head'), self.requests)
+
+    @unittest_run_loop
+    async def test_unreachable(self):
+        checker = await self.create_checker([], timeout=1)
+        await self.database.insert_or_replace(model.Golink('unreachable', 'http://127.0.0.1:1/'))
+
+        await checker.run()
+        statuses = await self.statuses()
+        self.assertTrue(statuses['unreachable'].dead)
+        self.assertIsNone(statuses['unreachable'].status)
+
+    @unittest_run_loop
+    async def test_recheck_not_due(self):
+        checker = await self.create_checker([('ok', '/ok')])
+
+        self.assertEqual(1, await checker.run())
+        self.assertEqual(0, await checker.run())
+
+    @unittest_run_loop
+    async def test_conditional_recheck(self):
+        checker = await self.create_checker([('etag', '/etag')], recheck_interval=0)
+
+        await checker.run()
+        self.assertEqual(self.ETAG, (await self.statuses())['etag'].etag)
+
+        await checker.run()
+        status = (await self.statuses())['etag']
+        self.assertEqual(304, status.status)
+        self.assertFalse(status.dead)
+        self.assertEqual(self.ETAG, status.etag)
+
+    @unittest_run_loop
+    async def test_batches(self):
+        checker = await self.create_checker([('ok{}'.format(n), '/ok') for n in range(10)], batch_size=3)
+
+        self.assertEqual(10, await checker.run())
+        self.assertTrue(all(s.checked is not None for s in (await self.statuses()).values()))
+
+    @unittest_run_loop
+    async def test_rate_limited_host_does_not_block_others(self):
+        checker = await self.create_checker([('ok{}'.format(n), '/ok') for n in range(4)], concurrency=2)
+        checker.rate_limiter.interval = 0.1
+        await self.database.insert_or_replace(
+            model.Golink('other', self.url('/ok').replace('127.0.0.1', 'localhost')))
+
+        self.assertEqual(5, await checker.run())
+        # The other host is checked without waiting for all of the rate limited host's links
+        self.assertLess(self.hosts.index('localhost'), 2)
+
+    @unittest_run_loop
+    async def test_template_checks_host(self):
+        checker = await self.create_checker([])
+        await self.database.insert_or_replace(model.Golink('template', self.url('/dead/') + '{1}'))
+
+        self.assertEqual(1, await checker.run())
+        status = (await self.statuses())['template']
+        self.assertFalse(status.dead)
+        self.assertIsNotNone(status.checked)
+        self.assertEqual([], self.requests)
+
+    @unittest_run_loop
+    async def test_template_unreachable(self):
+        checker = await self.create_checker([], timeout=1)
+        await self.database.insert_or_replace(model.Golink('template', 'http://127.0.0.1:1/{1}'))
+
+        await checker.run()
+        self.assertTrue((await self.statuses())['template'].dead)
+
+    @unittest_run_loop
+    async def test_max_pending(self):
+        checker = await self.create_checker([('ok{}'.format(n), '/ok') for n in range(10)], batch_size=3)
+
+        with mock.patch.object(linkcheck, 'MAX_PENDING', 2):
+            self.assertEqual(10, await checker.run())
+        self.assertTrue(all(s.checked is not None for s in (await self.statuses()).values()))
+
+    @unittest_run_loop
+    async def test_dead_links_ranked_last(self):
+        checker = await self.create_checker([('test-dead', '/dead'), ('test-ok', '/ok')])
+        await self.database.increment_visits('test-dead')
+
+        self.assertEqual(['test-dead', 'test-ok'], [g.name for g in await self.database.search('test')])
+        await checker.run()
+        self.assertEqual(['test-ok', 'test-dead'], [g.name for g in await self.database.search('test')])
+
+    @unittest_run_loop
+    async def test_edited_link_not_overwritten(self):
+        checker = await self.create_checker([('test', '/dead')])
+        status, = await self.database.find_link_statuses()
+        await self.database.insert_or_replace(model.Golink('test', self.url('/ok')))
+
+        await self.database.update_link_statuses([await checker.check(status, self.client.session)])
+        status, = await self.database.find_link_statuses()
+        self.assertIsNone(status.checked)
+
+
+class HostRateLimiterTestCase(AsyncTestCase):
+    def test_wait(self):
+        limiter = linkcheck.HostRateLimiter(0.05)
+
+        async def run():
+            start = time.monotonic()
+            for _ in range(3):
+                await limiter.wait('example.com')
+            await limiter.wait('example.org')
+            return time.monotonic() - start
+
+        elapsed = self.run_async(run())
+        self.assertGreaterEqual(elapsed, 0.1)
+        self.assertLess(elapsed, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
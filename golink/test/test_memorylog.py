@@ -0,0 +1,221 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from golink import memorylog, model
+from golink.test.util import AsyncTestCase
+
+
+class MemoryLogDatabaseTestCase(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'golinks.log')
+        self.database = self.connect()
+
+    def tearDown(self):
+        self.run_async(self.database.close())
+        self.tempdir.cleanup()
+        super().tearDown()
+
+    def connect(self, **kwargs):
+        return memorylog.Database.connect(self.path, loop=self.loop, **kwargs)
+
+    def reopen(self, **kwargs):
+        self.run_async(self.database.close())
+        self.database = self.connect(**kwargs)
+
+    def insert(self, name, url='http://example.com/', owner='owner'):
+        self.run_async(self.database.insert_or_replace(model.Golink(name, url, owner)))
+
+    def log_records(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_find_by_name(self):
+        self.insert('test')
+        self.assertEqual(model.Golink('test', 'http://example.com/', 'owner'),
+                         self.run_async(self.database.find_by_name('test')))
+        with self.assertRaises(KeyError):
+            self.run_async(self.database.find_by_name('missing'))
+
+    def test_returned_golinks_are_copies(self):
+        self.insert('test')
+        self.run_async(self.database.find_by_name('test')).visits = 100
+        self.assertEqual(0, self.run_async(self.database.find_by_name('test')).visits)
+
+    def test_find_by_owner(self):
+        for name in ('c', 'a', 'b'):
+            self.insert(name)
+        self.insert('d', owner='other')
+        self.assertEqual(['a', 'b', 'c'], [g.name for g in self.run_async(self.database.find_by_owner('owner'))])
+
+        self.run_async(self.database.delete('b'))
+        self.assertEqual(['a', 'c'], [g.name for g in self.run_async(self.database.find_by_owner('owner'))])
+
+    def test_find_by_url(self):
+        self.insert('a', 'http://example.com/foo/')
+        self.insert('b', 'http://example.com/bar')
+        self.assertEqual(['a'], [g.name for g in self.run_async(self.database.find_by_url('http://EXAMPLE.com/foo'))])
+
+    def test_invalid_port(self):
+        self.insert('a', 'http://example.com:notaport/')
+        self.reopen()
+        self.assertEqual('http://example.com:notaport/', self.run_async(self.database.find_by_name('a')).url)
+        self.run_async(self.database.delete('a'))
+
+    def test_search(self):
+        self.insert('test1')
+        self.insert('test2')
+        self.insert('other')
+        self.run_async(self.database.increment_visits('test2'))
+        self.assertEqual(['test2', 'test1'], [g.name for g in self.run_async(self.database.search('test'))])
+        self.assertEqual(['test2'], [g.name for g in self.run_async(self.database.search('test', limit=1))])
+
+    def test_search_index(self):
+        for fraction in (0, 1):
+            with self.subTest(fraction=fraction), mock.patch.object(memorylog, 'SEARCH_INDEX_MAX_FRACTION', fraction):
+                self.check_search_index()
+
+    def check_search_index(self):
+        self.insert('atestb', 'http://example.com/a')
+        self.insert('testtest', 'http://example.com/b')
+        self.insert('other', 'http://test.example.com/')
+        self.insert('test', 'http://example.com/c')
+
+        def search(query):
+            return sorted(g.name for g in self.run_async(self.database.search(query)))
+
+        self.assertEqual(['atestb', 'test', 'testtest'], search('TEST'))
+        self.assertEqual(['other'], search('http://test.'))
+        self.assertEqual(['atestb', 'other', 'test', 'testtest'], search(''))
+        self.assertEqual([], search('test\n'))
+
+        self.run_async(self.database.delete('test'))
+        self.insert('other', 'http://example.com/test')
+        self.assertEqual(['atestb', 'other', 'testtest'], search('http://example.com/'))
+        self.assertEqual(['atestb', 'testtest'], search('test'))
+        for name in ('atestb', 'other', 'testtest'):
+            self.run_async(self.database.delete(name))
+
+    def test_replay(self):
+        self.insert('a')
+        self.insert('b', 'http://example.com/b')
+        self.insert('a', 'http://example.com/a')
+        self.run_async(self.database.delete('b'))
+        self.run_async(self.database.increment_visits('a'))
+        self.run_async(self.database.increment_visits('a'))
+
+        self.reopen()
+        self.assertEqual([model.Golink('a', 'http://example.com/a', 'owner', 2)],
+                         list(self.run_async(self.database.find_all())))
+
+    def test_visits_logged_in_groups(self):
+        self.insert('a')
+        for _ in range(10):
+            self.run_async(self.database.increment_visits('a'))
+        self.run_async(self.database.flush())
+
+        self.assertEqual([{'op': 'visits', 'visits': {'a': 10}, 'seq': 2}], self.log_records()[1:])
+
+    def test_visits_before_replace(self):
+        self.insert('a')
+        self.run_async(self.database.increment_visits('a'))
+        self.insert('a', 'http://example.com/a')
+
+        self.reopen()
+        self.assertEqual(0, self.run_async(self.database.find_by_name('a')).visits)
+
+    def test_link_statuses(self):
+        self.insert('a')
+        status = model.LinkStatus('a', 'http://example.com/', dead=True, status=404, checked=1.0)
+        self.run_async(self.database.update_link_statuses([status]))
+
+        self.reopen()
+        self.assertEqual([status], self.run_async(self.database.find_link_statuses()))
+
+    def test_compact(self):
+        self.insert('a')
+        self.insert('b')
+        self.run_async(self.database.increment_visits('a'))
+        self.run_async(self.database.compact())
+        self.assertEqual([], self.log_records())
+        self.insert('c')
+
+        self.reopen()
+        self.assertEqual({'a': 1, 'b': 0, 'c': 0},
+                         {g.name: g.visits for g in self.run_async(self.database.find_all())})
+
+    def test_compact_automatically(self):
+        self.reopen(compact_min_records=5)
+        for n in range(5):
+            self.insert('a', 'http://example.com/{}'.format(n))
+        self.run_async(self.database._compaction)
+
+        self.assertTrue(os.path.exists(self.path + '.snapshot'))
+        self.assertEqual([], self.log_records())
+
+    def test_interrupted_compaction(self):
+        self.insert('a')
+        self.run_async(self.database.compact())
+        self.insert('b')
+        self.run_async(self.database.increment_visits('a'))
+        self.run_async(self.database.flush())
+        # Simulate a crash after switching logs, but before writing the snapshot
+        os.replace(self.path, self.path + '.old')
+        self.insert('c')
+
+        self.reopen()
+        self.assertFalse(os.path.exists(self.path + '.old'))
+        self.assertEqual({'a': 1, 'b': 0, 'c': 0},
+                         {g.name: g.visits for g in self.run_async(self.database.find_all())})
+
+        self.reopen()
+        self.assertEqual({'a': 1, 'b': 0, 'c': 0},
+                         {g.name: g.visits for g in self.run_async(self.database.find_all())})
+
+    def test_corrupt_last_record(self):
+        self.insert('a')
+        self.run_async(self.database.close())
+        with open(self.path, 'a') as f:
+            f.write('{"op": "put", "gol')
+
+        self.database = self.connect()
+        self.assertEqual(['a'], [g.name for g in self.run_async(self.database.find_all())])
+
+    def test_write_after_corrupt_last_record(self):
+        self.insert('a')
+        self.run_async(self.database.close())
+        with open(self.path, 'a') as f:
+            f.write('{"op": "put", "gol')
+
+        self.database = self.connect()
+        self.insert('c')
+        self.reopen()
+        self.assertEqual(['a', 'c'], sorted(g.name for g in self.run_async(self.database.find_all())))
+
+    def test_record_without_newline(self):
+        self.insert('a')
+        self.run_async(self.database.close())
+        with open(self.path) as f:
+            record = f.read().rstrip('\n')
+        with open(self.path, 'w') as f:
+            f.write(record)
+
+        self.database = self.connect()
+        self.insert('b')
+        self.reopen()
+        self.assertEqual(['b'], [g.name for g in self.run_async(self.database.find_all())])
+
+    def test_memory_only(self):
+        self.run_async(self.database.close())
+        self.database = memorylog.Database.connect(memorylog.MEMORY, loop=self.loop)
+        self.insert('a')
+        self.run_async(self.database.increment_visits('a'))
+        self.assertEqual(1, self.run_async(self.database.find_by_name('a')).visits)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,5 +37,96 @@ class GolinkTestCase(unittest.TestCase):
         self.assert_urljoin('http://www.example.com/path#foo123', golink, '123')
 
 
+class TemplateTestCase(unittest.TestCase):
+    def assert_expand(self, expected: str, golink: model.Golink, suffix: str):
+        self.assertEqual(expected, golink.expand(suffix))
+
+    def test_not_template(self):
+        golink = model.Golink('test', 'http://www.example.com/path/')
+        self.assertFalse(golink.is_template)
+        self.assert_expand('http://www.example.com/path/', golink, '')
+        self.assert_expand('http://www.example.com/path/123', golink, '123')
+
+    def test_segment(self):
+        golink = model.Golink('bug', 'https://tracker/issues?id={1}&view=full')
+        self.assertTrue(golink.is_template)
+        self.assert_expand('https://tracker/issues?id=1234&view=full', golink, '1234')
+        self.assert_expand('https://tracker/issues?id=&view=full', golink, '')
+
+    def test_multiple_segments(self):
+        golink = model.Golink('gh', 'https://github.com/{2}/{1}')
+        self.assert_expand('https://github.com/golink/dcoles', golink, 'dcoles/golink')
+        self.assert_expand('https://github.com//dcoles', golink, 'dcoles')
+
+    def test_all_suffix(self):
+        golink = model.Golink('gh', 'https://github.com/{*}?tab=readme')
+        self.assert_expand('https://github.com/dcoles/golink?tab=readme', golink, 'dcoles/golink')
+
+    def test_suffix_encoded(self):
+        golink = model.Golink('search', 'https://www.example.com/search?q={1}&lang=en')
+        self.assert_expand('https://www.example.com/search?q=a%26b%23c&lang=en', golink, 'a&b#c')
+        golink = model.Golink('docs', 'https://www.example.com/{*}')
+        self.assert_expand('https://www.example.com/a/b%3Fc', golink, 'a/b?c')
+
+    def test_literal_braces(self):
+        # Existing Golinks may contain braces that aren't placeholders
+        golink = model.Golink('test', 'http://www.example.com/search?q={x}')
+        self.assertFalse(golink.is_template)
+        self.assert_expand('http://www.example.com/search?q={x}', golink, '')
+
+    def test_validate(self):
+        model.validate_url('http://www.example.com/{1}/{22}/{*}')
+        for url in ('http://www.example.com/{0}', 'http://www.example.com/{x}', 'http://www.example.com/{1',
+                    'http://www.example.com/}', 'http://{1}.example.com/'):
+            with self.subTest(url=url):
+                with self.assertRaises(ValueError):
+                    model.validate_url(url)
+
+
+class NormalizeUrlTestCase(unittest.TestCase):
+    def assert_same(self, a, b):
+        self.assertEqual(model.normalize_url(a), model.normalize_url(b))
+        self.assertEqual(model.url_hash(a), model.url_hash(b))
+
+    def test_scheme_and_host_case(self):
+        self.assert_same('HTTP://WWW.Example.COM/Path', 'http://www.example.com/Path')
+
+    def test_path_case_preserved(self):
+        self.assertNotEqual(model.normalize_url('http://example.com/Path'),
+                            model.normalize_url('http://example.com/path'))
+
+    def test_trailing_slash(self):
+        self.assert_same('http://example.com/path/', 'http://example.com/path')
+        self.assert_same('http://example.com/', 'http://example.com')
+
+    def test_query_order(self):
+        self.assert_same('http://example.com/?b=2&a=1', 'http://example.com/?a=1&b=2')
+        self.assert_same('http://example.com/?q', 'http://example.com/?q=')
+
+    def test_default_port(self):
+        self.assert_same('http://example.com:80/', 'http://example.com/')
+        self.assert_same('https://example.com:443/', 'https://example.com/')
+        self.assertEqual('http://example.com:8080', model.normalize_url('http://example.com:8080/'))
+
+    def test_ipv6(self):
+        self.assertEqual('http://[::1]:8080/x', model.normalize_url('http://[::1]:8080/x'))
+        self.assert_same('http://[::1]:80/', 'http://[::1]/')
+
+    def test_invalid_port(self):
+        with self.assertRaises(ValueError):
+            model.validate_url('http://example.com:notaport/')
+        # Existing Golinks with invalid ports can still be loaded
+        model.Golink('test', 'http://example.com:notaport/')
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(model.url_hash_or_none('test', 'http://example.com:notaport/'))
+
+    def test_filter_by_url(self):
+        golinks = [model.Golink('a', 'http://EXAMPLE.com/foo/'), model.Golink('b', 'http://example.com/bar')]
+        self.assertEqual(['a'], [g.name for g in model.filter_by_url(golinks, 'http://example.com/foo')])
+
+    def test_fragment(self):
+        self.assert_same('http://example.com/path#foo', 'http://example.com/path')
+
+
 if __name__ == '__main__':
     unittest.main()
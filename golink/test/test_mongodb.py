@@ -0,0 +1,156 @@
+import os
+import socket
+import time
+import unittest
+
+from golink import model, mongodb
+from golink.test.util import AsyncTestCase
+
+# Tests require a MongoDB server, e.g. GOLINK_TEST_MONGODB_URL=mongodb://localhost:27017/
+MONGODB_URL = os.environ.get('GOLINK_TEST_MONGODB_URL')
+TEST_DATABASE = 'golink_test'
+
+
+def plan_stages(plan):
+    """All stage names in an explain() plan."""
+    if isinstance(plan, dict):
+        for key, value in plan.items():
+            if key == 'stage' and isinstance(value, str):
+                yield value
+            else:
+                yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+
+class StalledServerTestCase(AsyncTestCase):
+    """Tests against a "server" that accepts connections but never responds."""
+
+    def setUp(self):
+        import pymongo
+        super().setUp()
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen()
+        host, port = self.server.getsockname()
+        self.client = pymongo.MongoClient(f'mongodb://{host}:{port}/', **mongodb.timeout_options(0.2))
+        self.database = mongodb.Database(self.client)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+        super().tearDown()
+
+    def test_timeout(self):
+        import pymongo.errors
+        start = time.monotonic()
+        with self.assertRaises(pymongo.errors.PyMongoError):
+            self.run_async(self.database.find_by_name('test'))
+        self.assertLess(time.monotonic() - start, 5)
+
+
+@unittest.skipUnless(MONGODB_URL, 'GOLINK_TEST_MONGODB_URL not set')
+class MongoDatabaseTestCase(AsyncTestCase):
+    def setUp(self):
+        import pymongo
+        super().setUp()
+        self.client = pymongo.MongoClient(MONGODB_URL)
+        self.client.drop_database(TEST_DATABASE)
+        self.database = mongodb.Database(self.client, TEST_DATABASE)
+        self.database._upgrade_schema()
+
+        for n in range(100):
+            self.run_async(self.database.insert_or_replace(
+                model.Golink('link{}'.format(n), 'http://example.com/{}'.format(n), 'owner{}'.format(n % 10))))
+
+    def tearDown(self):
+        self.client.drop_database(TEST_DATABASE)
+        self.client.close()
+        super().tearDown()
+
+    @property
+    def golinks(self):
+        return self.database._golinks
+
+    def assert_index_scan(self, explain):
+        stages = set(plan_stages(explain['queryPlanner']['winningPlan']))
+        self.assertIn('IXSCAN', stages)
+        self.assertNotIn('COLLSCAN', stages)
+
+    def explain_command(self, command):
+        return self.database._db.command('explain', command, verbosity='queryPlanner')
+
+    def test_connect_ignores_url_database(self):
+        database = mongodb.Database.connect(MONGODB_URL.rstrip('/') + '/admin', database_name=TEST_DATABASE)
+        try:
+            self.assertEqual(TEST_DATABASE, database._db.name)
+            self.assertEqual(100, len(list(self.run_async(database.find_all()))))
+        finally:
+            database.client.close()
+
+    def test_schema_version(self):
+        self.assertEqual(mongodb.SCHEMA_VERSION, self.database.schema_version)
+
+    def test_unique_name(self):
+        import pymongo.errors
+        with self.assertRaises(pymongo.errors.DuplicateKeyError):
+            self.golinks.insert_one({'name': 'link0', 'url': 'http://example.com/'})
+
+    def test_duplicate_names(self):
+        self.golinks.drop_indexes()
+        self.golinks.insert_one({'name': 'link0', 'url': 'http://example.com/'})
+        with self.assertRaises(RuntimeError):
+            self.database._upgrade_schema()
+
+    def test_find_by_name(self):
+        self.assertEqual('link1', self.run_async(self.database.find_by_name('link1')).name)
+        self.assert_index_scan(self.golinks.find(mongodb._name_filter('link1')).limit(1).explain())
+
+    def test_find_by_owner(self):
+        golinks = list(self.run_async(self.database.find_by_owner('owner1')))
+        self.assertEqual(sorted(g.name for g in golinks), [g.name for g in golinks])
+        self.assert_index_scan(
+            self.golinks.find(mongodb._owner_filter('owner1'), sort=mongodb._OWNER_SORT).explain())
+
+    def test_find_by_url(self):
+        golinks = list(self.run_async(self.database.find_by_url('HTTP://EXAMPLE.COM/1/')))
+        self.assertEqual(['link1'], [g.name for g in golinks])
+        self.assert_index_scan(self.golinks.find(mongodb._url_hash_filter('http://example.com/1')).explain())
+
+    def test_search(self):
+        self.run_async(self.database.increment_visits('link10'))
+        golinks = list(self.run_async(self.database.search('link1')))
+        self.assertEqual('link10', golinks[0].name)
+        self.assert_index_scan(
+            self.golinks.find(mongodb._search_filter('link1'), sort=mongodb._SEARCH_SORT, limit=1000).explain())
+
+    def test_insert_or_replace(self):
+        self.assert_index_scan(self.explain_command({
+            'update': self.golinks.name,
+            'updates': [{'q': mongodb._name_filter('link1'), 'u': {'name': 'link1', 'url': 'http://example.com/'},
+                         'upsert': True}],
+        }))
+
+    def test_increment_visits(self):
+        self.assert_index_scan(self.explain_command({
+            'update': self.golinks.name,
+            'updates': [{'q': mongodb._name_filter('link1'), 'u': {'$inc': {'visits': 1}}}],
+        }))
+
+    def test_update_link_statuses(self):
+        self.assert_index_scan(self.explain_command({
+            'update': self.golinks.name,
+            'updates': [{'q': dict(mongodb._name_filter('link1'), url='http://example.com/1'),
+                         'u': {'$set': {'link_dead': True}}}],
+        }))
+
+    def test_delete(self):
+        self.assert_index_scan(self.explain_command({
+            'delete': self.golinks.name,
+            'deletes': [{'q': mongodb._name_filter('link1'), 'limit': 1}],
+        }))
+
+
+if __name__ == '__main__':
+    unittest.main()
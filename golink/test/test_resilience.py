@@ -0,0 +1,238 @@
+import asyncio
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import unittest_run_loop
+
+from golink import model, persistence, resilience
+from golink.test.test_views import BaseViewsTestCase, TestDatabase
+from golink.test.util import AsyncTestCase
+
+
+class FaultyDatabase(TestDatabase):
+    """Test database that can be made to fail or hang."""
+
+    def __init__(self):
+        super().__init__()
+        self.fault = None
+
+    async def _inject_fault(self):
+        if self.fault == 'error':
+            raise ConnectionError('Injected fault')
+        elif self.fault == 'hang':
+            await asyncio.sleep(3600)
+
+    async def find_all(self):
+        await self._inject_fault()
+        return await super().find_all()
+
+    async def find_by_owner(self, owner):
+        await self._inject_fault()
+        return await super().find_by_owner(owner)
+
+    async def find_by_name(self, name):
+        await self._inject_fault()
+        return await super().find_by_name(name)
+
+    async def insert_or_replace(self, golink):
+        if not isinstance(golink, model.Golink):
+            raise TypeError('Golink required')
+        await self._inject_fault()
+        return await super().insert_or_replace(golink)
+
+    async def increment_visits(self, name):
+        await self._inject_fault()
+        return await super().increment_visits(name)
+
+    async def delete(self, name):
+        await self._inject_fault()
+        return await super().delete(name)
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = resilience.CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=self.clock)
+
+    def test_opens_after_threshold(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.assertEqual(resilience.CircuitBreaker.CLOSED, self.breaker.state)
+
+        self.breaker.record_failure()
+        self.assertEqual(resilience.CircuitBreaker.OPEN, self.breaker.state)
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_failures(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.breaker.record_success()
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.assertEqual(resilience.CircuitBreaker.CLOSED, self.breaker.state)
+
+    def test_half_open(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.clock.time = 10
+        self.assertEqual(resilience.CircuitBreaker.HALF_OPEN, self.breaker.state)
+        self.assertTrue(self.breaker.allow())
+        # Only a single probe is allowed (until it times out)
+        self.assertFalse(self.breaker.allow())
+        self.clock.time = 20
+        self.assertTrue(self.breaker.allow())
+
+        # A single failure re-opens the breaker
+        self.breaker.record_failure()
+        self.assertEqual(resilience.CircuitBreaker.OPEN, self.breaker.state)
+
+        self.clock.time = 30
+        self.breaker.record_success()
+        self.assertEqual(resilience.CircuitBreaker.CLOSED, self.breaker.state)
+        self.assertTrue(self.breaker.allow())
+
+
+class ResilientDatabaseTestCase(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        self.backend = FaultyDatabase()
+        self.database = resilience.ResilientDatabase(
+            self.backend, resilience.CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=self.clock),
+            timeout=0.01, snapshot_interval=0)
+        self.run_async(self.backend.insert_or_replace(model.Golink('test', 'http://example.com/')))
+        self.run_async(self.database.load())
+
+    def tearDown(self):
+        self.run_async(self.database.close())
+        super().tearDown()
+
+    def test_timeout(self):
+        self.backend.fault = 'hang'
+        with self.assertRaises(persistence.DatabaseUnavailable):
+            self.run_async(self.database.find_by_owner('owner'))
+
+    def test_writes_not_timed_out(self):
+        # A timed out write could still be committed later, so writes wait for the backend
+        self.backend.fault = 'hang'
+        write = self.loop.create_task(self.database.insert_or_replace(model.Golink('new', 'http://example.com/')))
+        self.run_async(asyncio.sleep(0.05))
+        self.assertFalse(write.done())
+        write.cancel()
+        self.run_async(asyncio.gather(write, return_exceptions=True))
+
+    def test_not_found_is_healthy(self):
+        for _ in range(3):
+            with self.assertRaises(KeyError):
+                self.run_async(self.database.find_by_name('missing'))
+        self.assertTrue(self.database.healthy)
+
+    def test_invalid_arguments_are_healthy(self):
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                self.run_async(self.database.find_by_url('http://example.com:notaport/'))
+            with self.assertRaises(TypeError):
+                self.run_async(self.database.insert_or_replace('not a golink'))
+        self.assertTrue(self.database.healthy)
+
+    def test_find_by_name_from_snapshot(self):
+        for fault in ('hang', 'error'):
+            with self.subTest(fault=fault):
+                self.backend.fault = fault
+                golink = self.run_async(self.database.find_by_name('test'))
+                self.assertEqual('http://example.com/', golink.url)
+                with self.assertRaises(KeyError):
+                    self.run_async(self.database.find_by_name('missing'))
+
+    def test_breaker_opens(self):
+        self.backend.fault = 'error'
+        for _ in range(2):
+            self.run_async(self.database.find_by_name('test'))
+        self.assertFalse(self.database.healthy)
+
+        # Backend is no longer called while the breaker is open
+        self.backend.fault = 'hang'
+        self.assertEqual('test', self.run_async(asyncio.wait_for(self.database.find_by_name('test'), 0.005)).name)
+
+    def test_writes_rejected_while_unhealthy(self):
+        self.backend.fault = 'error'
+        for _ in range(2):
+            self.run_async(self.database.find_by_name('test'))
+
+        self.backend.fault = None
+        with self.assertRaises(persistence.DatabaseUnavailable):
+            self.run_async(self.database.insert_or_replace(model.Golink('new', 'http://example.com/')))
+        with self.assertRaises(persistence.DatabaseUnavailable):
+            self.run_async(self.database.delete('test'))
+        self.assertNotIn('new', self.backend.golinks)
+
+    def test_increment_visits_ignores_failure(self):
+        self.backend.fault = 'error'
+        self.run_async(self.database.increment_visits('test'))
+        self.assertEqual(0, self.backend.golinks['test'].visits)
+
+    def test_recovery(self):
+        self.backend.fault = 'error'
+        for _ in range(2):
+            self.run_async(self.database.find_by_name('test'))
+
+        self.backend.fault = None
+        self.clock.time = 10
+        self.run_async(self.database.insert_or_replace(model.Golink('new', 'http://example.com/new')))
+        self.assertTrue(self.database.healthy)
+
+        # Snapshot includes new writes
+        self.backend.fault = 'error'
+        self.assertEqual('http://example.com/new', self.run_async(self.database.find_by_name('new')).url)
+
+    def test_delete_removes_from_snapshot(self):
+        self.run_async(self.database.delete('test'))
+        self.backend.fault = 'error'
+        with self.assertRaises(KeyError):
+            self.run_async(self.database.find_by_name('test'))
+
+
+class ResilientViewsTestCase(BaseViewsTestCase):
+    async def get_application(self):
+        app = await super().get_application()
+        self.backend = FaultyDatabase()
+        app['DATABASE'] = resilience.ResilientDatabase(self.backend, timeout=0.01, snapshot_interval=0)
+        return app
+
+    @unittest_run_loop
+    async def test_redirect_while_unhealthy(self):
+        await self.app['DATABASE'].insert_or_replace(model.Golink('test', 'http://example.com/test/'))
+        self.backend.fault = 'hang'
+
+        resp = await self.get_golink()
+        self.assert_status(resp)
+        self.assert_location(resp)
+
+    @unittest_run_loop
+    async def test_invalid_reverse_url(self):
+        for _ in range(5):
+            resp = await self.client.request('GET', '/+reverse', params={'url': 'http://example.com:notaport/'},
+                                             headers={'Accept': 'application/json'})
+            self.assert_status(resp, web.HTTPBadRequest)
+        self.assertTrue(self.app['DATABASE'].healthy)
+
+    @unittest_run_loop
+    async def test_write_while_unhealthy(self):
+        self.backend.fault = 'error'
+
+        resp = await self.post_golink()
+        self.assert_status(resp, web.HTTPServiceUnavailable)
+        self.assertIn('temporarily unavailable', await resp.text())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import json
+import unittest
+from unittest import mock
+
+import attr
+
+from golink import model, serialization
+
+GOLINKS = [
+    model.Golink('test', 'http://example.com/test/', 'foo', 10),
+    model.Golink('quote', 'http://example.com/?q="☃"', None, 0),
+]
+
+
+class SerializationTestCase(unittest.TestCase):
+    def assert_serializes(self, serializer):
+        expected = {'golinks': [attr.asdict(g) for g in GOLINKS]}
+        self.assertEqual(expected, json.loads(serializer.golinks(GOLINKS)))
+        self.assertEqual({'golinks': []}, json.loads(serializer.golinks([])))
+
+    def test_golink_to_dict(self):
+        for golink in GOLINKS:
+            self.assertEqual(attr.asdict(golink), serialization.golink_to_dict(golink))
+
+    def test_json(self):
+        self.assert_serializes(serialization.create_serializer('json'))
+
+    def test_json_fragments(self):
+        serializer = serialization.create_serializer('json', fragments=True)
+        self.assert_serializes(serializer)
+
+        # Visits are not cached
+        golink = model.Golink('test', 'http://example.com/test/', 'foo', 11)
+        self.assertEqual(attr.asdict(golink), json.loads(serializer.golink(golink)))
+
+    @unittest.skipIf(serialization.orjson is None, 'orjson not installed')
+    def test_orjson(self):
+        self.assert_serializes(serialization.create_serializer('orjson'))
+        self.assert_serializes(serialization.create_serializer('orjson', fragments=True))
+
+    def test_orjson_fallback(self):
+        with mock.patch.object(serialization, 'orjson', None):
+            serializer = serialization.create_serializer('orjson')
+        self.assertIs(serialization.ENCODERS['json'], serializer.dumps)
+
+
+if __name__ == '__main__':
+    unittest.main()
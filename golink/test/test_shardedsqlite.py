@@ -0,0 +1,147 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from golink import model, shardedsqlite, sqlite
+from golink.test.util import AsyncTestCase
+
+
+class ShardedSqliteDatabaseTestCase(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'golinks.sqlite')
+        self.database = shardedsqlite.Database.connect(self.path, shards=4, loop=self.loop)
+
+    def tearDown(self):
+        self.run_async(self.database.close())
+        shutil.rmtree(self.tmpdir)
+        super().tearDown()
+
+    def insert(self, *golinks):
+        for golink in golinks:
+            self.run_async(self.database.insert_or_replace(golink))
+
+    def test_find_by_name(self):
+        self.insert(*(model.Golink(f'link{i}', f'http://example.com/{i}') for i in range(20)))
+
+        self.assertEqual('http://example.com/7', self.run_async(self.database.find_by_name('link7')).url)
+        self.assertEqual('http://example.com/7', self.run_async(self.database.find_by_name('LINK7')).url)
+        with self.assertRaises(KeyError):
+            self.run_async(self.database.find_by_name('missing'))
+
+    def test_spreads_across_shards(self):
+        self.insert(*(model.Golink(f'link{i}', f'http://example.com/{i}') for i in range(20)))
+
+        counts = [len(list(self.run_async(shard.find_all()))) for shard in self.database.shards]
+        self.assertEqual(20, sum(counts))
+        self.assertTrue(all(counts))
+
+    def test_increment_visits_and_delete(self):
+        self.insert(model.Golink('a', 'http://example.com/a'))
+        self.run_async(self.database.increment_visits('a'))
+        self.assertEqual(1, self.run_async(self.database.find_by_name('a')).visits)
+
+        self.run_async(self.database.delete('a'))
+        with self.assertRaises(KeyError):
+            self.run_async(self.database.find_by_name('a'))
+
+    def test_find_by_owner_merges_by_name(self):
+        names = [f'link{i}' for i in range(20)]
+        self.insert(*(model.Golink(name, 'http://example.com', owner='alice') for name in names))
+        self.insert(model.Golink('other', 'http://example.com', owner='bob'))
+
+        golinks = self.run_async(self.database.find_by_owner('alice'))
+        self.assertEqual(sorted(names), [g.name for g in golinks])
+
+    def test_find_by_url_merges_by_visits(self):
+        self.insert(*(model.Golink(f'link{i}', 'http://example.com/', visits=i) for i in range(10)))
+
+        golinks = self.run_async(self.database.find_by_url('http://EXAMPLE.com'))
+        self.assertEqual(list(range(9, -1, -1)), [g.visits for g in golinks])
+
+    def test_search_merges_by_rank(self):
+        self.insert(*(model.Golink(f'link{i}', f'http://example.com/{i}', visits=i) for i in range(20)))
+        self.run_async(self.database.update_link_statuses([
+            model.LinkStatus('link19', 'http://example.com/19', dead=True, checked=1.0)]))
+
+        golinks = list(self.run_async(self.database.search('link', limit=5)))
+        self.assertEqual(['link18', 'link17', 'link16', 'link15', 'link14'], [g.name for g in golinks])
+
+        golinks = list(self.run_async(self.database.search('link')))
+        self.assertEqual('link19', golinks[-1].name)
+        self.assertEqual(20, len(golinks))
+
+    def test_link_statuses(self):
+        self.insert(*(model.Golink(f'link{i}', f'http://example.com/{i}') for i in range(10)))
+        self.run_async(self.database.update_link_statuses([
+            model.LinkStatus(f'link{i}', f'http://example.com/{i}', dead=True, checked=1.0) for i in range(5)]))
+
+        statuses = self.run_async(self.database.find_link_statuses())
+        self.assertEqual({f'link{i}' for i in range(5)}, {s.name for s in statuses if s.dead})
+
+    def test_memory(self):
+        database = shardedsqlite.Database.connect(shardedsqlite.MEMORY, shards=2, loop=self.loop)
+        try:
+            self.run_async(database.insert_or_replace(model.Golink('a', 'http://example.com/a')))
+            self.assertEqual('http://example.com/a', self.run_async(database.find_by_name('a')).url)
+        finally:
+            self.run_async(database.close())
+        self.assertFalse([f for f in os.listdir() if f.startswith(shardedsqlite.MEMORY)])
+
+    def test_shard_count_mismatch(self):
+        with self.assertRaises(RuntimeError):
+            shardedsqlite.Database.connect(self.path, shards=2, loop=self.loop)
+
+    def test_reshard(self):
+        self.insert(*(model.Golink(f'link{i}', f'http://example.com/{i}', visits=i) for i in range(20)))
+        self.run_async(self.database.close())
+
+        destination = os.path.join(self.tmpdir, 'resharded.sqlite')
+        self.assertEqual(20, shardedsqlite.reshard(self.path, 4, destination, 3))
+
+        self.database = shardedsqlite.Database.connect(destination, shards=3, loop=self.loop)
+        golinks = self.run_async(self.database.find_all())
+        self.assertEqual({(f'link{i}', i) for i in range(20)}, {(g.name, g.visits) for g in golinks})
+        self.assertEqual(5, self.run_async(self.database.find_by_name('link5')).visits)
+
+    def test_reshard_unsharded(self):
+        source = os.path.join(self.tmpdir, 'unsharded.sqlite')
+        con = sqlite3.connect(source)
+        sqlite._create_schema(con)
+        with con:
+            con.execute("INSERT INTO Golinks (name, url, owner, visits) VALUES ('a', 'http://example.com', NULL, 3)")
+        con.close()
+
+        destination = os.path.join(self.tmpdir, 'resharded.sqlite')
+        self.assertEqual(1, shardedsqlite.reshard(source, None, destination, 2))
+
+    def test_reshard_leaves_source_unchanged(self):
+        # Original schema, before URL hashes, link statuses or templates
+        source = os.path.join(self.tmpdir, 'legacy.sqlite')
+        con = sqlite3.connect(source)
+        with con:
+            con.execute('CREATE TABLE Golinks (name VARCHAR PRIMARY KEY COLLATE NOCASE, url VARCHAR NOT NULL, '
+                        'owner VARCHAR, visits INT DEFAULT 0)')
+            con.execute("INSERT INTO Golinks VALUES ('a', 'http://example.com/{a}', NULL, 3)")
+        con.close()
+        with open(source, 'rb') as f:
+            contents = f.read()
+        os.chmod(source, 0o444)
+
+        destination = os.path.join(self.tmpdir, 'resharded.sqlite')
+        self.assertEqual(1, shardedsqlite.reshard(source, None, destination, 2))
+        with open(source, 'rb') as f:
+            self.assertEqual(contents, f.read())
+
+        self.run_async(self.database.close())
+        self.database = shardedsqlite.Database.connect(destination, shards=2, loop=self.loop)
+        golink = self.run_async(self.database.find_by_name('a'))
+        self.assertEqual(('http://example.com/%7Ba%7D', 3), (golink.url, golink.visits))
+        self.assertEqual(['a'], [g.name for g in self.run_async(self.database.find_by_url(golink.url))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import sqlite3
+import unittest
+
+from golink import model, sqlite
+from golink.test.util import AsyncTestCase
+
+
+class SqliteDatabaseTestCase(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.database = sqlite.Database.connect(':memory:', loop=self.loop)
+
+    def tearDown(self):
+        self.database._executor.shutdown()
+        super().tearDown()
+
+    def test_find_by_url(self):
+        self.run_async(self.database.insert_or_replace(model.Golink('a', 'http://example.com/foo/')))
+        self.run_async(self.database.insert_or_replace(model.Golink('b', 'http://EXAMPLE.com/foo')))
+        self.run_async(self.database.insert_or_replace(model.Golink('c', 'http://example.com/bar')))
+
+        golinks = self.run_async(self.database.find_by_url('http://example.com/foo'))
+        self.assertEqual({'a', 'b'}, {g.name for g in golinks})
+
+    def test_find_by_url_uses_index(self):
+        plan = self.database._executor.submit(lambda: self.database._con.execute(
+            'EXPLAIN QUERY PLAN ' + sqlite.FIND_BY_URL_HASH_SQL, dict(url_hash='')).fetchall()).result()
+        self.assertIn('Golinks_url_hash', ' '.join(row[-1] for row in plan))
+
+    def test_upgrade_schema(self):
+        con = sqlite3.connect(':memory:')
+        con.execute('CREATE TABLE Golinks (name VARCHAR PRIMARY KEY COLLATE NOCASE, url VARCHAR NOT NULL, '
+                    'owner VARCHAR, visits INT DEFAULT 0)')
+        con.execute("INSERT INTO Golinks VALUES ('a', 'http://example.com/foo', NULL, 3)")
+        sqlite._create_schema(con)
+
+        hashes = con.execute('SELECT url_hash FROM Golinks').fetchall()
+        self.assertEqual([(model.url_hash('http://example.com/foo'),)], hashes)
+
+    def test_upgrade_schema_literal_braces(self):
+        con = sqlite3.connect(':memory:')
+        con.execute('CREATE TABLE Golinks (name VARCHAR PRIMARY KEY COLLATE NOCASE, url VARCHAR NOT NULL, '
+                    'owner VARCHAR, visits INT DEFAULT 0)')
+        con.execute("INSERT INTO Golinks VALUES ('a', 'http://example.com/{1}?q={x}', NULL, 3)")
+        sqlite._create_schema(con)
+
+        self.assertEqual([('http://example.com/%7B1%7D?q=%7Bx%7D', model.url_hash('http://example.com/{1}?q={x}'))],
+                         con.execute('SELECT url, url_hash FROM Golinks').fetchall())
+
+        # Templates created after upgrading are unchanged
+        con.execute("UPDATE Golinks SET url='http://example.com/{1}'")
+        sqlite._create_schema(con)
+        self.assertEqual([('http://example.com/{1}',)], con.execute('SELECT url FROM Golinks').fetchall())
+
+    def test_upgrade_schema_invalid_url(self):
+        con = sqlite3.connect(':memory:')
+        con.execute('CREATE TABLE Golinks (name VARCHAR PRIMARY KEY COLLATE NOCASE, url VARCHAR NOT NULL, '
+                    'owner VARCHAR, visits INT DEFAULT 0)')
+        con.execute("INSERT INTO Golinks VALUES ('a', 'http://example.com:notaport/', NULL, 3)")
+        with self.assertLogs(level='WARNING'):
+            sqlite._create_schema(con)
+
+        self.assertEqual([(None,)], con.execute('SELECT url_hash FROM Golinks').fetchall())
+
+
+if __name__ == '__main__':
+    unittest.main()
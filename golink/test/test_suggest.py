@@ -0,0 +1,87 @@
+import unittest
+
+from golink import model, suggest
+from golink.test.test_views import TestDatabase
+from golink.test.util import AsyncTestCase
+
+
+class OsaDistanceTestCase(unittest.TestCase):
+    def test_distance(self):
+        self.assertEqual(0, suggest.osa_distance('github', 'github', 2))
+        self.assertEqual(1, suggest.osa_distance('github', 'gihtub', 2))  # Transposition
+        self.assertEqual(1, suggest.osa_distance('github', 'githb', 2))  # Deletion
+        self.assertEqual(1, suggest.osa_distance('github', 'githubb', 2))  # Insertion
+        self.assertEqual(1, suggest.osa_distance('github', 'gitnub', 2))  # Substitution
+        self.assertEqual(2, suggest.osa_distance('github', 'gtihbu', 2))
+
+    def test_max_distance(self):
+        self.assertEqual(2, suggest.osa_distance('github', 'gitlab', 1))
+        self.assertEqual(2, suggest.osa_distance('a', 'abcdef', 1))
+        self.assertEqual(1, suggest.osa_distance('ab', 'ba', 1))
+        self.assertEqual(0, suggest.osa_distance('github', 'github', 0))
+
+
+class SuggestionIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = suggest.SuggestionIndex()
+        for name, visits in (('github', 10), ('gitlab', 5), ('gist', 1), ('jira', 0)):
+            self.index.add(name, visits)
+
+    def test_suggest(self):
+        self.assertEqual(['github'], self.index.suggest('gihtub'))
+        self.assertEqual(['gist'], self.index.suggest('gis'))
+        self.assertEqual([], self.index.suggest('confluence'))
+
+    def test_suggest_excludes_exact(self):
+        self.assertEqual([], self.index.suggest('github'))
+
+    def test_suggest_long_names(self):
+        self.index.add('documentation-server')
+        self.assertEqual(['documentation-server'], self.index.suggest('documentation-sever'))
+        self.assertEqual(['documentation-server'], self.index.suggest('dcoumentation-server'))
+
+    def test_rank_by_visits(self):
+        self.index.add('gitxb', 1)
+        self.index.add('gitab', 100)
+        self.assertEqual(['gitab', 'gitxb'], self.index.suggest('gitb'))
+
+    def test_shared_prefix_and_suffix(self):
+        for n in range(1000):
+            self.index.add('project-{}'.format(n))
+            self.index.add('{}-notes'.format(n))
+        self.assertEqual(['project-123'], self.index.suggest('projetc-123'))
+        self.assertEqual(['123-notes'], self.index.suggest('123-ntoes'))
+        # Only names found by the more selective of the prefix and suffix are compared
+        candidates = [sum(len(deletes.get(edit, ())) for edit in edits)
+                      for deletes, edits in self.index._indexes('projetc-123')]
+        self.assertLess(min(candidates), 10)
+
+    def test_remove(self):
+        self.index.remove('github')
+        self.assertNotIn('github', self.index)
+        self.assertEqual([], self.index.suggest('gihtub'))
+        self.index.remove('github')  # Removing missing name is a no-op
+
+
+class SuggestingDatabaseTestCase(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.database = suggest.SuggestingDatabase(TestDatabase())
+
+    def test_load(self):
+        self.run_async(self.database.database.insert_or_replace(model.Golink('github', 'http://github.com')))
+        self.run_async(self.database.load())
+        self.assertEqual(['github'], self.run_async(self.database.suggest('gihtub')))
+
+    def test_incremental_updates(self):
+        self.run_async(self.database.insert_or_replace(model.Golink('gitlab', 'http://gitlab.com')))
+        self.run_async(self.database.insert_or_replace(model.Golink('gitlub', 'http://gitlub.com')))
+        self.run_async(self.database.increment_visits('gitlub'))
+        self.assertEqual(['gitlub', 'gitlab'], self.run_async(self.database.suggest('gitlib')))
+
+        self.run_async(self.database.delete('gitlub'))
+        self.assertEqual(['gitlab'], self.run_async(self.database.suggest('gitlib')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,8 @@ from typing import Type
 
 from aiohttp.test_utils import AioHTTPTestCase, unittest_run_loop
 from aiohttp import web
+import aiohttp_jinja2
+import jinja2
 
 from golink import model, auth
 from golink import views
@@ -20,6 +22,19 @@ class TestDatabase:
         logging.info('find_by_name: %s', name)
         return self.golinks[name]
 
+    async def find_by_url(self, url: str):
+        logging.info('find_by_url: %s', url)
+        normalized = model.normalize_url(url)
+        return [g for g in self.golinks.values() if model.normalize_url(g.url) == normalized]
+
+    async def find_all(self):
+        logging.info('find_all')
+        return list(self.golinks.values())
+
+    async def suggest(self, name: str, limit=5):
+        logging.info('suggest: %s', name)
+        return []
+
     async def insert_or_replace(self, golink: model.Golink):
         logging.info('insert_or_replace: %s', golink)
         self.golinks[golink.name] = golink
@@ -28,6 +43,13 @@ class TestDatabase:
         logging.info('increment_visits: %s', name)
         self.golinks[name].visits += 1
 
+    async def delete(self, name: str):
+        logging.info('delete: %s', name)
+        del self.golinks[name]
+
+    async def close(self):
+        logging.info('close')
+
 
 class TestAuth(auth.Auth):
     USER = 'foo'
@@ -38,7 +60,7 @@ class TestAuth(auth.Auth):
 
 class BaseViewsTestCase(AioHTTPTestCase):
     async def get_application(self):
-        app = web.Application()
+        app = web.Application(middlewares=[views.database_unavailable_middleware])
         app['DATABASE'] = TestDatabase()
         app['AUTH_TYPE'] = TestAuth
         app.router.add_routes(views.routes)
@@ -107,6 +129,15 @@ class ViewsTestCase(BaseViewsTestCase):
         self.assert_location(resp, 'http://example.com/foobar')
         self.assert_visits(1)
 
+    @unittest_run_loop
+    async def test_golink_template_redirect(self):
+        await self.add_golink_url(url='http://example.com/issues?id={1}&view=full')
+
+        resp = await self.get_golink('/test/1234')
+        self.assert_status(resp)
+        self.assert_location(resp, 'http://example.com/issues?id=1234&view=full')
+        self.assert_visits(1)
+
     @unittest_run_loop
     async def test_multiple_visits(self):
         await self.add_golink_url()
@@ -134,6 +165,12 @@ class ViewsTestCase(BaseViewsTestCase):
         self.assert_location(resp, '/+edit/test')
         self.assert_database()
 
+    @unittest_run_loop
+    async def test_post_golink_invalid_port(self):
+        resp = await self.post_golink(url='http://example.com:notaport/')
+        self.assert_status(resp, web.HTTPBadRequest)
+        self.assert_database({})
+
     @unittest_run_loop
     async def test_post_golink_existing_non_owner(self):
         await self.add_golink_url(url='http://example.com/old/', owner='frank')
@@ -238,6 +275,55 @@ class SearchViewsTestCase(BaseViewsTestCase):
         self.assert_status(resp, web.HTTPBadRequest)
 
 
+class ReverseViewsTestCase(BaseViewsTestCase):
+    """Tests for the /+reverse view."""
+
+    async def get_application(self):
+        app = await super().get_application()
+        aiohttp_jinja2.setup(app, loader=jinja2.PackageLoader('golink', 'templates'))
+        return app
+
+    async def get_reverse(self, url):
+        return await self.client.request('GET', '/+reverse', params={'url': url},
+                                         headers={'Accept': 'application/json'})
+
+    @unittest_run_loop
+    async def test_reverse(self):
+        await self.add_golink_url()
+        await self.add_golink_url(name='other', url='http://example.com/other')
+
+        resp = await self.get_reverse('HTTP://EXAMPLE.COM/test')
+        self.assert_status(resp, web.HTTPOk)
+        self.assertEqual(['test'], [g['name'] for g in (await resp.json())['golinks']])
+
+    @unittest_run_loop
+    async def test_reverse_no_match(self):
+        await self.add_golink_url()
+
+        resp = await self.get_reverse('http://example.com/missing')
+        self.assert_status(resp, web.HTTPOk)
+        self.assertEqual({'golinks': []}, await resp.json())
+
+    @unittest_run_loop
+    async def test_reverse_html(self):
+        await self.add_golink_url()
+
+        resp = await self.client.request('GET', '/+reverse', params={'url': 'http://example.com/test'})
+        self.assert_status(resp, web.HTTPOk)
+        text = await resp.text()
+        self.assertIn('value="http://example.com/test"', text)
+        self.assertIn('/+edit/test', text)
+
+        resp = await self.client.request('GET', '/+reverse')
+        self.assert_status(resp, web.HTTPOk)
+        self.assertNotIn('Results', await resp.text())
+
+    @unittest_run_loop
+    async def test_reverse_invalid_url(self):
+        resp = await self.get_reverse('http://example.com:notaport/')
+        self.assert_status(resp, web.HTTPBadRequest)
+
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
     unittest.main()
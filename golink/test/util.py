@@ -0,0 +1,15 @@
+import asyncio
+import unittest
+
+
+class AsyncTestCase(unittest.TestCase):
+    """Test case with its own event loop (`self.loop`)."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
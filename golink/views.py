@@ -1,18 +1,30 @@
 # Copyright 2018 David Coles <coles.david@gmail.com>
 # This project is licensed under the terms of the MIT license. See LICENSE.txt
+import time
 from urllib.parse import urlsplit
 
 import aiohttp_jinja2
-import attr
 import yarl
 from aiohttp import web
 import posixpath
 
 from golink import auth
 from golink import persistence
-from golink.model import Golink, validate_name
+from golink import serialization
+from golink.model import Golink, validate_name, validate_url
 
 routes = web.RouteTableDef()
+default_serializer = serialization.JsonSerializer()
+
+
+@web.middleware
+async def database_unavailable_middleware(request: web.Request, handler):
+    """Respond with "503 Service Unavailable" if the database is unavailable."""
+    try:
+        return await handler(request)
+    except persistence.DatabaseUnavailable as e:
+        raise web.HTTPServiceUnavailable(text=f'Golink database is temporarily unavailable: {e}',
+                                         headers={'Retry-After': '30'})
 
 
 @routes.get('/favicon.ico')
@@ -65,6 +77,10 @@ class GolinkBaseView(web.View):
     def database(self) -> persistence.Database:
         return self.request.app['DATABASE']
 
+    @property
+    def serializer(self) -> serialization.JsonSerializer:
+        return self.request.app.get('JSON_SERIALIZER', default_serializer)
+
     @property
     def name(self):
         """Get Golink name from path."""
@@ -109,14 +125,22 @@ class GolinkBaseView(web.View):
         return aiohttp_jinja2.render_template(name, self.request, full_context)
 
     async def handle_golink(self, name, suffix=None):
+        start = time.perf_counter()
         try:
             golink = await self.database.find_by_name(name)
         except KeyError:
+            self.request['hit'] = False
+            self.request['backend_latency'] = time.perf_counter() - start
             # Redirect to edit view
             raise web.HTTPSeeOther(self.url_for_edit(name))
 
         await self.database.increment_visits(name)
-        url = golink.with_suffix(suffix) if suffix else golink.url
+        url = golink.expand(suffix or '')
+
+        # Recorded for the structured access log
+        self.request['hit'] = True
+        self.request['backend_latency'] = time.perf_counter() - start
+        self.request['target'] = url
         raise web.HTTPFound(url)
 
     def url_for_name(self, name, suffix=None) -> yarl.URL:
@@ -168,8 +192,7 @@ class SearchView(GolinkBaseView):
 
         if accept == 'application/json':
             headers = {'Cache-Control': 'private, max-age=60'}
-            results = {'golinks': [attr.asdict(g) for g in golinks]}
-            return web.json_response(results, headers=headers)
+            return self.serializer.response(golinks, headers=headers)
         else:
             return self.render_template('search.html', {'query': query, 'golinks': golinks})
 
@@ -197,6 +220,29 @@ class SearchView(GolinkBaseView):
             raise web.HTTPBadRequest(text='`action` must be either "go" or "search"')
 
 
+@routes.view('/+reverse', name='reverse')
+class ReverseView(GolinkBaseView):
+    """Handles finding Golinks that point at a URL."""
+
+    async def get(self):
+        accept = self.request.headers.get('Accept')
+        url = self.request.query.get('url')
+
+        if url:
+            try:
+                golinks = list(await self.database.find_by_url(url))
+            except ValueError as e:
+                raise web.HTTPBadRequest(text=f'Invalid URL: {e}')
+        else:
+            golinks = []
+
+        if accept == 'application/json':
+            headers = {'Cache-Control': 'private, max-age=60'}
+            return self.serializer.response(golinks, headers=headers)
+        else:
+            return self.render_template('reverse.html', {'query_url': url, 'golinks': golinks})
+
+
 @routes.view('/+edit/{path}', name='edit')
 class EditView(GolinkBaseView):
     """View for editing Golinks."""
@@ -205,7 +251,8 @@ class EditView(GolinkBaseView):
         try:
             golink = await self.database.find_by_name(self.name)
         except KeyError:
-            return self.render_template('create.html', {'name': self.name})
+            suggestions = await self.database.suggest(self.name)
+            return self.render_template('create.html', {'name': self.name, 'suggestions': suggestions})
 
         return self.render_template('edit.html', {'golink': golink})
 
@@ -231,6 +278,7 @@ class EditView(GolinkBaseView):
             await self.database.delete(self.name)
         else:
             try:
+                validate_url(url)
                 golink = Golink(self.name, url, self.auth.current_user())
             except ValueError as e:
                 raise web.HTTPBadRequest(text='Invalid Golink: {}'.format(e))
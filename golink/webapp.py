@@ -1,6 +1,7 @@
 # Copyright 2018 David Coles <coles.david@gmail.com>
 # This project is licensed under the terms of the MIT license. See LICENSE.txt
 import argparse
+import asyncio
 import logging
 import pkg_resources
 
@@ -8,15 +9,34 @@ from aiohttp import web
 import aiohttp_jinja2
 import jinja2
 
-from golink import views, auth, sqlite, mongodb
+from golink import views, auth, sqlite, shardedsqlite, mongodb, memorylog, accesslog, suggest, serialization, linkcheck, resilience
 
 
-def connect_to_database(type, connection_string):
+def new_event_loop(type='asyncio'):
+    """Create a new event loop of `type`, falling back to asyncio if uvloop is not installed."""
+    if type == 'uvloop':
+        try:
+            import uvloop
+        except ImportError:
+            logging.warning('uvloop is not installed, falling back to asyncio')
+        else:
+            return uvloop.new_event_loop()
+    elif type != 'asyncio':
+        raise RuntimeError(f'Unknown event loop type: {type}')
+
+    return asyncio.new_event_loop()
+
+
+def connect_to_database(type, connection_string, loop=None, shards=shardedsqlite.DEFAULT_SHARDS, timeout=None):
     logging.info('Connecting to %s: %s', type, connection_string)
     if type == "sqlite":
-        return sqlite.Database.connect(connection_string)
+        return sqlite.Database.connect(connection_string, loop=loop)
+    elif type == "sqlite-sharded":
+        return shardedsqlite.Database.connect(connection_string, shards=shards, loop=loop)
     elif type == "mongodb":
-        return mongodb.Database.connect(connection_string)
+        return mongodb.Database.connect(connection_string, timeout=timeout)
+    elif type == "memory-log":
+        return memorylog.Database.connect(connection_string, loop=loop)
     else:
         raise RuntimeError(f'Unknown connection type: {type}')
 
@@ -27,21 +47,59 @@ def main():
     parser.add_argument('-P', '--port', type=int, default=8080)
     parser.add_argument('--database-type', default='sqlite')
     parser.add_argument('--database', default=':memory:')
+    parser.add_argument('--database-shards', type=int, default=shardedsqlite.DEFAULT_SHARDS,
+                        help='Number of shards (for --database-type sqlite-sharded)')
     parser.add_argument('--auth', default='null')
     parser.add_argument('--readonly', action='store_true')
+    parser.add_argument('--database-timeout', type=float, default=resilience.DEFAULT_TIMEOUT,
+                        help='Deadline for database operations in seconds (0 disables timeouts and circuit breaker)')
+    parser.add_argument('--event-loop', choices=('asyncio', 'uvloop'), default='asyncio')
+    parser.add_argument('--json', choices=sorted(serialization.ENCODERS), default='json', help='JSON encoder')
+    parser.add_argument('--json-fragments', action='store_true', help='Cache encoded JSON for each Golink')
+    parser.add_argument('--no-suggestions', action='store_true', help='Disable "did you mean" suggestions')
+    parser.add_argument('--link-check-interval', type=float, default=0,
+                        help='Check for dead links every this many seconds (disabled by default)')
+    parser.add_argument('--access-log', help='Write a structured (JSON lines) access log to this path')
+    parser.add_argument('--access-log-max-bytes', type=int, default=accesslog.DEFAULT_MAX_BYTES)
+    parser.add_argument('--access-log-rotate-interval', type=float, default=accesslog.DEFAULT_ROTATE_INTERVAL)
+    parser.add_argument('--access-log-backup-count', type=int, default=accesslog.DEFAULT_BACKUP_COUNT)
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO)
 
-    app = web.Application()
-    app['DATABASE'] = connect_to_database(args.database_type, args.database)
+    loop = new_event_loop(args.event_loop)
+    asyncio.set_event_loop(loop)
+
+    app = web.Application(middlewares=[views.database_unavailable_middleware])
+    database = connect_to_database(args.database_type, args.database, loop=loop, shards=args.database_shards,
+                                   timeout=args.database_timeout)
+    if args.database_timeout:
+        database = resilience.ResilientDatabase(database, timeout=args.database_timeout)
+        app.on_startup.append(lambda app, database=database: database.load())
+    if not args.no_suggestions:
+        database = suggest.SuggestingDatabase(database)
+        app.on_startup.append(lambda app: app['DATABASE'].load())
+    app['DATABASE'] = database
+    app.on_cleanup.append(lambda app: app['DATABASE'].close())
     app['AUTH_TYPE'] = auth.AUTHENTICATORS[args.auth]
     app['READONLY'] = args.readonly
+    app['JSON_SERIALIZER'] = serialization.create_serializer(args.json, fragments=args.json_fragments)
     aiohttp_jinja2.setup(app, loader=jinja2.PackageLoader('golink', 'templates'), trim_blocks=True, lstrip_blocks=True)
     app.router.add_static('/+static', pkg_resources.resource_filename('golink', 'static'))
     app.router.add_routes(views.routes)
 
-    web.run_app(app, host=args.host, port=args.port)
+    if args.link_check_interval:
+        linkcheck.setup(app, linkcheck.LinkChecker(database), args.link_check_interval)
+
+    run_app_kwargs = {}
+    if args.access_log:
+        access_log = accesslog.AccessLog(
+            args.access_log, max_bytes=args.access_log_max_bytes,
+            rotate_interval=args.access_log_rotate_interval, backup_count=args.access_log_backup_count)
+        accesslog.setup(app, access_log)
+        run_app_kwargs['access_log_class'] = accesslog.AccessLogger
+
+    web.run_app(app, host=args.host, port=args.port, loop=loop, **run_app_kwargs)
 
 
 if __name__ == '__main__':
@@ -14,5 +14,8 @@ setup(
     package_data={
         'golink': ['templates/*.html', 'static/*.css', 'static/*.js'],
     },
+    extras_require={
+        'fast': ['uvloop', 'orjson'],
+    },
     zip_safe=False,
 )